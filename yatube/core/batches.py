@@ -0,0 +1,25 @@
+"""Обход больших таблиц пачками по возрастанию pk.
+
+Каждая пачка — запрос WHERE pk > <последний pk> ... LIMIT, без OFFSET:
+стоимость пачки не растёт к концу таблицы, а обход можно продолжить
+с любого pk.
+"""
+
+
+def pk_chunks(queryset, chunk_size, *fields, after=None):
+    """Строки queryset пачками не больше chunk_size.
+
+    Без fields пачка — список pk, с fields — кортежи (pk, *fields).
+    after — pk, после которого начинается обход.
+    """
+    queryset = queryset.order_by('pk')
+    while True:
+        chunk = queryset if after is None else queryset.filter(pk__gt=after)
+        if fields:
+            rows = list(chunk.values_list('pk', *fields)[:chunk_size])
+        else:
+            rows = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0] if fields else rows[-1]
@@ -0,0 +1,26 @@
+"""Счётчики попаданий и промахов кешей, хранящиеся в самом кеше."""
+from django.core.cache import cache
+
+
+def count(key, amount=1):
+    if not amount:
+        return
+    if cache.add(key, amount, None):
+        return
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, None)
+
+
+def hit_ratio(hits_key, misses_key):
+    """{'hits', 'misses', 'hit_ratio'} по двум счётчикам."""
+    values = cache.get_many([hits_key, misses_key])
+    hits = values.get(hits_key, 0)
+    misses = values.get(misses_key, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
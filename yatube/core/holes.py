@@ -0,0 +1,57 @@
+"""Пользовательские фрагменты («дырки») в общих закешированных страницах.
+
+Страница рендерится один раз для всех: на месте фрагментов, зависящих от
+пользователя, тег {% hole %} оставляет маркер. При ответе каждому
+пользователю маркеры заменяются отрендеренными для него фрагментами.
+"""
+import json
+import re
+
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+HOLE_RE = re.compile(r'<!--hole:(?P<name>[\w-]+):(?P<args>.*?)-->')
+
+_renderers = {}
+
+
+def register(name):
+    """Регистрирует функцию render(request, *args) -> str для фрагмента."""
+    def decorator(func):
+        _renderers[name] = func
+        return func
+    return decorator
+
+
+def render(request, name, *args):
+    return _renderers[name](request, *args)
+
+
+def marker(name, *args):
+    # Аргументы экранируются, чтобы '-->' не мог закрыть комментарий.
+    return f'<!--hole:{name}:{escape(json.dumps(args))}-->'
+
+
+def punching(request):
+    """Рендерится ли сейчас общая страница с маркерами вместо фрагментов."""
+    return getattr(request, 'punch_holes', False)
+
+
+def stitch(request, content):
+    """Подставляет в общую страницу фрагменты текущего пользователя."""
+    def replace(match):
+        args = json.loads(_unescape(match.group('args')))
+        return render(request, match.group('name'), *args)
+    return HOLE_RE.sub(replace, content)
+
+
+def _unescape(value):
+    return (
+        value.replace('&lt;', '<').replace('&gt;', '>')
+        .replace('&quot;', '"').replace('&#39;', "'").replace('&amp;', '&')
+    )
+
+
+@register('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
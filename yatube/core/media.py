@@ -0,0 +1,168 @@
+"""Раздача загруженных файлов.
+
+В продакшене (MEDIA_ACCEL задан) Django только проверяет путь, а сам
+файл отдаёт фронтовой прокси по заголовку X-Accel-Redirect (nginx) или
+X-Sendfile (Apache, lighttpd): воркер Python не занят на время передачи.
+
+Без прокси файл отдаётся через FileResponse с поддержкой Range,
+ETag/Last-Modified и ответом 304. Имена из хеша содержимого (исходники
+постов и миниатюры sorl) никогда не меняют содержимое и кешируются
+браузером навсегда.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from yatube.settings import MEDIA_ACCEL, MEDIA_ACCEL_PREFIX, MEDIA_MAX_AGE
+
+# posts/ab/<sha256>.jpg, cache/ab/cd/<md5>.jpg.
+HASHED_NAME_RE = re.compile(r'/[0-9a-f]{32,64}\.\w+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+class RangeFile:
+    """Файл, из которого читается только length байт начиная с start."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно или None, если диапазон не один.
+
+    Несколько диапазонов сразу не поддерживаются: по RFC 7233 на такой
+    запрос можно ответить целым файлом.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    start, end = match.groups()
+    if start == '':
+        # bytes=-500: последние 500 байт.
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _etag(stat):
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range: диапазон в силе, только если файл не изменился."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _cache_headers(response, name):
+    if HASHED_NAME_RE.search(name):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=MEDIA_MAX_AGE)
+    return response
+
+
+def _accel_response(name, path):
+    response = HttpResponse()
+    # Тип по расширению ставит сам прокси; пустой text/html ему мешает.
+    del response['Content-Type']
+    if MEDIA_ACCEL == 'X-Accel-Redirect':
+        response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + quote(name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def _stat(path):
+    """(полный путь, stat) файла в MEDIA_ROOT; Http404, если его нет."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if os.path.isdir(full_path):
+        raise Http404
+    return full_path, stat
+
+
+def _content_type(path):
+    content_type, encoding = mimetypes.guess_type(path)
+    # Сжатые файлы отдаются как есть, без Content-Encoding.
+    if encoding or not content_type:
+        return 'application/octet-stream'
+    return content_type
+
+
+@require_safe
+def serve(request, path):
+    full_path, stat = _stat(path)
+    name = path.replace(os.sep, '/')
+    if MEDIA_ACCEL:
+        return _cache_headers(_accel_response(name, full_path), name)
+
+    etag = _etag(stat)
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        if not_modified.status_code == 304:
+            not_modified['ETag'] = etag
+        return _cache_headers(not_modified, name)
+
+    size = stat.st_size
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _range_applies(
+            request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(full_path, 'rb')
+    content_type = _content_type(full_path)
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(file, start, end - start + 1),
+            status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return _cache_headers(response, name)
@@ -0,0 +1,172 @@
+"""Read-through кеш объектов, которые view ищут по pk, slug или имени.
+
+Объект хранится в кеше под ключом с pk; поиск по другому уникальному
+полю (slug, username) хранит только указатель поле -> pk и сверяет
+поле у найденного объекта, так что после переименования старый
+указатель просто перестаёт срабатывать.
+
+Сохранение и удаление объекта зарегистрированной модели удаляет его
+из кеша (и ещё раз после коммита транзакции, чтобы параллельный запрос
+не успел положить туда старую строку). Массовые update() сигналов не
+шлют — после них нужно вызывать invalidate().
+
+В пределах одного запроса объект ищется один раз: повторные поиски
+берутся из request.
+"""
+import copy
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+from yatube.settings import OBJECT_CACHE_TIMEOUT
+
+from . import cache_stats
+
+HITS_KEY = 'object-cache:hits'
+MISSES_KEY = 'object-cache:misses'
+
+# Модель -> поля, которые можно класть в кеш (см. register).
+_cached_fields = {}
+
+
+def _object_key(model, pk):
+    return f'object:{model._meta.label_lower}:{pk}'
+
+
+def _pointer_key(model, field, value):
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return f'object:{model._meta.label_lower}:{field}:{digest}'
+
+
+def _store(obj):
+    """Кладёт копию объекта без загруженных связанных объектов.
+
+    У моделей, зарегистрированных с fields, остальные поля в копии
+    отложены (deferred) и при обращении читаются из БД.
+    """
+    stored = copy.copy(obj)
+    stored._state = copy.copy(obj._state)
+    stored._state.fields_cache = {}
+    fields = _cached_fields.get(type(obj))
+    if fields is not None:
+        for field in obj._meta.concrete_fields:
+            if not field.primary_key and field.name not in fields:
+                stored.__dict__.pop(field.attname, None)
+    cache.set(
+        _object_key(type(obj), obj.pk), stored, OBJECT_CACHE_TIMEOUT)
+
+
+def _from_cache(model, field, value):
+    if field == 'pk':
+        return cache.get(_object_key(model, value))
+    pk = cache.get(_pointer_key(model, field, value))
+    if pk is None:
+        return None
+    obj = cache.get(_object_key(model, pk))
+    if obj is None or getattr(obj, field) != value:
+        return None
+    return obj
+
+
+def _load(queryset, field, value, related):
+    """Промах: объект из БД; он и его связанные объекты — в кеш."""
+    model = queryset.model
+    obj = queryset.get(**{field: value})
+    _store(obj)
+    if field != 'pk':
+        cache.set(
+            _pointer_key(model, field, value), obj.pk, OBJECT_CACHE_TIMEOUT)
+    for name in related:
+        if model._meta.get_field(name).is_cached(obj):
+            related_obj = getattr(obj, name)
+            if related_obj is not None:
+                _store(related_obj)
+    return obj
+
+
+def _attach_related(request, obj, related):
+    for name in related:
+        rel = obj._meta.get_field(name)
+        related_pk = getattr(obj, rel.attname)
+        if related_pk is not None:
+            setattr(obj, name, get_object(
+                request, rel.related_model, pk=related_pk))
+
+
+def _memo(request):
+    if request is None:
+        return {}
+    if not hasattr(request, '_object_cache'):
+        request._object_cache = {}
+    return request._object_cache
+
+
+def get_object(request, queryset, related=(), **lookup):
+    """Объект по одному полю: из запроса, из кеша или из БД.
+
+    queryset — модель или queryset, которым объект читается из БД при
+    промахе (например, с select_related). Внешние ключи из related
+    при попадании тоже достаются через кеш.
+    """
+    queryset = getattr(queryset, '_default_manager', queryset).all()
+    model = queryset.model
+    (field, value), = lookup.items()
+    if field in ('pk', model._meta.pk.name):
+        field, value = 'pk', model._meta.pk.to_python(value)
+    memo = _memo(request)
+    memo_key = (model, field, value)
+    if memo_key in memo:
+        return memo[memo_key]
+    obj = _from_cache(model, field, value)
+    if obj is None:
+        cache_stats.count(MISSES_KEY)
+        obj = _load(queryset, field, value, related)
+    else:
+        cache_stats.count(HITS_KEY)
+        _attach_related(request, obj, related)
+    memo[memo_key] = obj
+    return obj
+
+
+def get_object_or_404(request, queryset, related=(), **lookup):
+    queryset = getattr(queryset, '_default_manager', queryset).all()
+    try:
+        return get_object(request, queryset, related, **lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404(
+            f'{queryset.model._meta.object_name} не найден')
+
+
+def invalidate(model, pks):
+    keys = [_object_key(model, pk) for pk in pks]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _invalidate_instance(sender, instance, **kwargs):
+    invalidate(sender, [instance.pk])
+
+
+def register(*models, fields=None):
+    """Сбрасывает кеш объектов моделей при их сохранении и удалении.
+
+    fields — имена полей, которые можно хранить в общем кеше; по
+    умолчанию все.
+    """
+    for model in models:
+        if fields is not None:
+            _cached_fields[model] = set(fields)
+        post_save.connect(
+            _invalidate_instance, sender=model, weak=False,
+            dispatch_uid=f'object-cache:{model._meta.label_lower}:save')
+        post_delete.connect(
+            _invalidate_instance, sender=model, weak=False,
+            dispatch_uid=f'object-cache:{model._meta.label_lower}:delete')
+
+
+def stats():
+    """Попадания и промахи кеша объектов."""
+    return cache_stats.hit_ratio(HITS_KEY, MISSES_KEY)
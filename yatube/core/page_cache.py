@@ -0,0 +1,260 @@
+"""Кеш целых страниц с версионными ключами и «дырками» под пользователя.
+
+Каждая страница зависит от набора областей (scope): например, лента
+группы — от 'group:<slug>'. Номер версии области входит в ключ кеша,
+поэтому инвалидация — это один cache.incr версии, без поиска ключей:
+старые записи просто перестают читаться и истекают по таймауту.
+
+В кеше лежит общая для всех версия страницы с маркерами на месте
+пользовательских фрагментов (см. core.holes); при ответе маркеры
+заменяются фрагментами текущего пользователя.
+"""
+import hashlib
+import math
+import os
+import random
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from yatube.settings import (PAGE_CACHE_EARLY_BETA, PAGE_CACHE_LOCK_DIR,
+                             PAGE_CACHE_LOCK_TIMEOUT, PAGE_CACHE_LOCK_WAIT,
+                             PAGE_CACHE_STALE_TIMEOUT, PAGE_CACHE_TIMEOUT)
+
+from . import holes
+
+VERSION_PREFIX = 'page-version:'
+# Как часто запрос без замка проверяет, не готова ли страница.
+WAIT_STEP = 0.05
+
+
+def _version_key(scope):
+    return VERSION_PREFIX + scope
+
+
+def _first_version():
+    """Версия для пропавшего из кеша ключа.
+
+    Ключ версии может быть вытеснен (файловый кеш удаляет случайные
+    записи и с timeout=None). Начни версия снова с 1, вернулись бы
+    страницы и ETag, посчитанные до прежних bump; время в наносекундах
+    всегда больше любой выданной раньше версии.
+    """
+    return time.time_ns()
+
+
+def get_versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            first = _first_version()
+            cache.add(key, first, None)
+            versions[key] = cache.get(key, first)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Делает недействительными все страницы, зависящие от scopes."""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _first_version(), None)
+
+
+def page_key(request, scopes):
+    query = sorted(request.GET.lists())
+    versions = get_versions(scopes)
+    raw = repr((request.path, query, list(zip(scopes, versions))))
+    return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _expired_early(expires, delta, beta=PAGE_CACHE_EARLY_BETA):
+    """Пора ли пересчитать страницу, срок которой истекает в expires.
+
+    Вероятностное раннее истечение (XFetch): чем ближе срок и чем
+    дольше страница считалась (delta секунд), тем вероятнее, что
+    очередной запрос пересчитает её заранее, и запросы не упираются
+    в истёкший ключ все разом.
+    """
+    early = -delta * beta * math.log(1 - random.random())
+    return time.time() + early >= expires
+
+
+def _lock_path(key):
+    return os.path.join(PAGE_CACHE_LOCK_DIR, key.replace(':', '-'))
+
+
+def _acquire(key):
+    """Берёт право пересчитать страницу одному запросу на все процессы.
+
+    Замок — файл, созданный с O_EXCL: создать его может только один
+    процесс или поток. cache.add для этого не годится: в файловом
+    кеше это проверка и запись. Замок старше PAGE_CACHE_LOCK_TIMEOUT
+    считается брошенным (процесс упал) и перехватывается.
+    """
+    os.makedirs(PAGE_CACHE_LOCK_DIR, exist_ok=True)
+    path = _lock_path(key)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            if not _abandoned(path):
+                return False
+            _release(key)
+    return False
+
+
+def _abandoned(path):
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        return True
+    return age > PAGE_CACHE_LOCK_TIMEOUT
+
+
+def _release(key):
+    try:
+        os.remove(_lock_path(key))
+    except FileNotFoundError:
+        pass
+
+
+def _wait_for(key):
+    """Ждёт, пока страницу положит в кеш запрос, взявший замок.
+
+    None — если замок сняли, а страницы нет (ответ не кешируется), или
+    ожидание дольше PAGE_CACHE_LOCK_WAIT.
+    """
+    path = _lock_path(key)
+    deadline = time.monotonic() + PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        cached = cache.get(key)
+        if cached is not None or not os.path.exists(path):
+            return cached
+    return None
+
+
+def _render(view, key, timeout, request, *args, **kwargs):
+    """Вызывает view и кладёт общую часть страницы в кеш."""
+    request.punch_holes = True
+    started = time.monotonic()
+    try:
+        response = view(request, *args, **kwargs)
+    finally:
+        request.punch_holes = False
+    if response.status_code != 200 or response.streaming:
+        return response
+    content = response.content.decode(response.charset)
+    if not response.cookies:
+        # Запись живёт дольше срока: пока один запрос пересчитывает
+        # страницу, остальные отдают устаревшую.
+        entry = (
+            content, response['Content-Type'], time.time() + timeout,
+            time.monotonic() - started)
+        cache.set(key, entry, timeout + PAGE_CACHE_STALE_TIMEOUT)
+    response.content = holes.stitch(request, content)
+    return response
+
+
+def _recompute(view, key, seen, timeout, request, *args, **kwargs):
+    """Пересчитывает страницу под замком, если её не успели пересчитать.
+
+    seen — запись, которую запрос видел до замка; если её уже заменил
+    другой запрос, отдаётся новая. Без замка возвращает None.
+    """
+    if not _acquire(key):
+        return None
+    try:
+        cached = cache.get(key)
+        if cached is not None and (seen is None or cached[2] != seen[2]):
+            return _cached_response(request, cached)
+        return _render(view, key, timeout, request, *args, **kwargs)
+    finally:
+        _release(key)
+
+
+def _cached_response(request, cached):
+    content, content_type, _, _ = cached
+    return HttpResponse(
+        holes.stitch(request, content), content_type=content_type)
+
+
+def cache_shared_page(scopes, timeout=PAGE_CACHE_TIMEOUT):
+    """Кеширует общую часть страницы для всех GET-запросов.
+
+    scopes(request, *args, **kwargs) возвращает список областей, от
+    версий которых зависит страница. Ответ пользователю — одно чтение из
+    кеша плюс рендер его фрагментов. Страницу пересчитывает один
+    запрос: при истечении срока остальные получают прежнюю, а если
+    страницы в кеше нет вовсе (например, после новой версии области),
+    ждут её до PAGE_CACHE_LOCK_WAIT секунд.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = page_key(request, scopes(request, *args, **kwargs))
+            cached = cache.get(key)
+            if cached is None or _expired_early(cached[2], cached[3]):
+                response = _recompute(
+                    view, key, cached, timeout, request, *args, **kwargs)
+                if response is not None:
+                    return response
+            if cached is None:
+                cached = _wait_for(key)
+            if cached is None:
+                # Страницу не закешировали или пересчёт затянулся.
+                return _render(view, key, timeout, request, *args, **kwargs)
+            return _cached_response(request, cached)
+        return wrapper
+    return decorator
+
+
+def scope_versions(scopes):
+    """Валидатор для conditional_page: версии областей страницы."""
+    def validator(request, *args, **kwargs):
+        return get_versions(scopes(request, *args, **kwargs))
+    return validator
+
+
+def conditional_page(validator):
+    """Отвечает 304 Not Modified, если страница не менялась.
+
+    validator(request, *args, **kwargs) — дешёвое значение, которое
+    меняется вместе со страницей (версии областей, дата правки), или
+    None, если проверять нечего. ETag складывается из него, адреса и
+    cookie: пользовательские фрагменты зависят от сессии, а сравнение
+    cookie не требует её загрузки. Поэтому при совпадении ETag view,
+    кеш страниц и шаблоны не вызываются вовсе.
+    """
+    def etag(request, *args, **kwargs):
+        value = validator(request, *args, **kwargs)
+        if value is None:
+            return None
+        raw = repr((
+            value, request.get_full_path(),
+            request.META.get('HTTP_COOKIE', '')))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Браузер переспрашивает страницу каждый раз, но с ETag.
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,237 @@
+import base64
+import heapq
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор: страницы выбираются по курсору, а не через OFFSET.
+
+    Курсор — непрозрачный токен с ключом последней (или первой) записи
+    страницы, поэтому любая страница читается одним запросом без COUNT(*).
+    Номера страниц (?page=N) поддерживаются для совместимости со старыми
+    ссылками.
+
+    transform применяется к выбранным строкам, например чтобы превратить
+    записи ленты в посты; ключ курсора при этом берётся из исходных строк.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id'), transform=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+        self.transform = transform
+
+    def get_page(self, number=None, cursor=None):
+        """Страница по курсору, по номеру или первая страница."""
+        if cursor:
+            try:
+                return self.page_by_cursor(cursor)
+            except InvalidPage:
+                pass
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        return self.page_by_number(max(number, 1))
+
+    def page_by_cursor(self, cursor):
+        direction, number, values = self.decode_cursor(cursor)
+        forward = direction == 'n'
+        rows = self.fetch_after(values, forward, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return self._build_page(rows, number, has_more, True)
+        rows.reverse()
+        return self._build_page(rows, number, True, has_more)
+
+    def page_by_number(self, number):
+        """Совместимость с ?page=N: OFFSET, но без подсчёта всей таблицы."""
+        offset = (number - 1) * self.per_page
+        rows = self.fetch_slice(offset, self.per_page + 1)
+        if not rows and number > 1:
+            return self.page(self.num_pages)
+        has_next = len(rows) > self.per_page
+        return self._build_page(
+            rows[:self.per_page], number, has_next, number > 1)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        return self.page_by_number(number)
+
+    def fetch_after(self, values, forward, limit):
+        """Строки строго после ключа values в порядке обхода.
+
+        При обратном обходе (forward=False) строки идут в обратном порядке.
+        """
+        queryset = self._ordered().filter(
+            self._keyset_filter(values, forward))
+        if not forward:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        return list(queryset[:limit])
+
+    def fetch_slice(self, offset, limit):
+        return list(self._ordered()[offset:offset + limit])
+
+    def key(self, obj):
+        return tuple(getattr(obj, name) for name in self.fields)
+
+    def encode_cursor(self, direction, number, key):
+        values = [self._serialize(value) for value in key]
+        raw = json.dumps([direction, number] + values).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, number, *raw_values = data
+            if direction not in ('n', 'p') or len(raw_values) != len(
+                    self.fields):
+                raise ValueError
+            values = self.cursor_values(raw_values)
+            return direction, max(int(number), 1), values
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidPage('Некорректный курсор')
+
+    def cursor_values(self, raw_values):
+        """Значения ключа из JSON курсора в типах полей модели."""
+        model = self.object_list.model
+        return [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(self.fields, raw_values)
+        ]
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        keys = [self.key(row) for row in rows]
+        if self.transform is not None:
+            rows = [self.transform(row) for row in rows]
+        page = Page(rows, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor('n', number + 1, keys[-1])
+        if rows and has_previous:
+            page.previous_cursor = self.encode_cursor(
+                'p', number - 1, keys[0])
+        return page
+
+    def _ordered(self):
+        return self.object_list.order_by(*self.ordering)
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+
+    def _keyset_filter(self, values, forward):
+        """Лексикографическое сравнение ключа: (a, b) < (x, y).
+
+        Отдельное условие a <= x по первому полю даёт СУБД диапазон по
+        индексу, так что сортировка берётся из индекса без temp B-tree.
+        """
+        lookup = 'lt' if forward == self.descending else 'gt'
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_name, prev_value in zip(self.fields[:index], values):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        bound = Q(**{f'{self.fields[0]}__{lookup}e': values[0]})
+        return bound & condition
+
+    @staticmethod
+    def _serialize(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Keyset-пагинация по нескольким источникам с k-way merge.
+
+    Каждый источник — CursorPaginator со своим queryset и порядком; ключи
+    источников должны совпадать по смыслу (например, (pub_date, id) поста
+    и (pub_date, post_id) записи ленты). Страница читает не больше
+    per_page + 1 строк из каждого источника.
+    """
+
+    def __init__(self, sources, per_page, **kwargs):
+        self.sources = list(sources)
+        first = self.sources[0]
+        super().__init__(
+            first.object_list, per_page, ordering=first.ordering, **kwargs)
+
+    @cached_property
+    def count(self):
+        return sum(source.count for source in self.sources)
+
+    def fetch_after(self, values, forward, limit):
+        return self._merge(
+            [source.fetch_after(values, forward, limit)
+             for source in self.sources],
+            forward, limit)
+
+    def fetch_slice(self, offset, limit):
+        rows = self._merge(
+            [source.fetch_slice(0, offset + limit)
+             for source in self.sources],
+            True, offset + limit)
+        return rows[offset:]
+
+    def key(self, row):
+        return row[0]
+
+    def _merge(self, streams, forward, limit):
+        """Сливает отсортированные потоки в пары (ключ, объект)."""
+        keyed = [
+            [(source.key(obj), index, obj) for obj in rows]
+            for index, (source, rows) in enumerate(zip(self.sources, streams))
+        ]
+        merged = heapq.merge(
+            *keyed,
+            key=lambda item: item[0],
+            reverse=forward == self.descending,
+        )
+        result = []
+        for key, index, obj in islice(merged, limit):
+            transform = self.sources[index].transform
+            result.append((key, transform(obj) if transform else obj))
+        return result
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        page = super()._build_page(rows, number, has_next, has_previous)
+        page.object_list = [obj for _, obj in page.object_list]
+        return page
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор для больших таблиц без точного COUNT(*).
+
+    Без фильтров число строк оценивается по MAX(pk) — это один шаг по
+    индексу первичного ключа; удалённые строки дают небольшую
+    переоценку, и последние страницы могут оказаться пустыми. С
+    фильтрами строки считаются точно, но не дальше count_limit: после
+    него ограничен и номер последней страницы.
+    """
+
+    def __init__(self, object_list, per_page, *args, count_limit=10000,
+                 **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.count_limit = count_limit
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = self.object_list.aggregate(estimate=Max('pk'))
+            return estimate['estimate'] or 0
+        return self.object_list[:self.count_limit].count()
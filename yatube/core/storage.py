@@ -0,0 +1,58 @@
+"""Хранилище, которое называет файлы по хешу содержимого.
+
+Файл кладётся в <каталог upload_to>/<2 символа хеша>/<sha256><расширение>.
+Одинаковые загрузки получают одно имя и хранятся один раз; миниатюры
+sorl строятся от имени исходника и тоже становятся общими.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _AlreadyStored(Exception):
+    pass
+
+
+def content_hash(content):
+    """sha256 файла, читаемого кусками."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(directory, digest, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(
+            posixpath.dirname(name), content_hash(content), name)
+        try:
+            return super().save(name, content, max_length=max_length)
+        except _AlreadyStored:
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        # Файл с таким именем уже содержит те же байты: второй раз его
+        # не пишем. Срабатывает и при гонке двух одинаковых загрузок.
+        if self.exists(name):
+            raise _AlreadyStored(name)
+        return super().get_available_name(name, max_length=max_length)
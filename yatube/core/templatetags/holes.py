@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Фрагмент, зависящий от пользователя.
+
+    В общей закешированной странице вместо него остаётся маркер, который
+    core.page_cache заменяет при ответе конкретному пользователю.
+    """
+    request = context.get('request')
+    if request is not None and holes.punching(request):
+        return mark_safe(holes.marker(name, *args))
+    return mark_safe(holes.render(request, name, *args))
@@ -1,6 +1,22 @@
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+
+from . import two_tier_cache
+from .batches import pk_chunks
+from .two_tier_cache import TwoTierCache
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = b'0123456789'
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +27,196 @@ class ViewTestClass(TestCase):
     def test_template_error_page(self):
         response = self.client.get('/non-page/')
         self.assertTemplateUsed(response, ('core/404.html'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServeTests(TestCase):
+    name = 'posts/ab/' + 'ab' * 32 + '.jpg'
+
+    def setUp(self):
+        path = os.path.join(TEMP_MEDIA_ROOT, self.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as stream:
+            stream.write(CONTENT)
+        self.url = '/media/' + self.name
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_whole_file(self):
+        """Файл отдаётся с валидаторами и вечным кешем для хеш-имени."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_byte_ranges(self):
+        """Диапазоны bytes=a-b, bytes=a- и bytes=-n."""
+        cases = {
+            'bytes=2-5': (b'2345', 'bytes 2-5/10'),
+            'bytes=7-': (b'789', 'bytes 7-9/10'),
+            'bytes=-2': (b'89', 'bytes 8-9/10'),
+            'bytes=8-100': (b'89', 'bytes 8-9/10'),
+        }
+        for header, (body, content_range) in cases.items():
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+    def test_missing_and_outside_files(self):
+        for url in ('/media/posts/none.jpg', '/media/../settings.py',
+                    '/media/posts/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @mock.patch('core.media.MEDIA_ACCEL', 'X-Accel-Redirect')
+    def test_x_accel_redirect(self):
+        """С прокси тело не отдаётся, только заголовок для nginx."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/' + self.name)
+
+    @mock.patch('core.media.MEDIA_ACCEL', 'X-Sendfile')
+    def test_x_sendfile(self):
+        response = self.client.get('/media/posts/../' + self.name)
+        self.assertEqual(
+            response['X-Sendfile'], os.path.join(TEMP_MEDIA_ROOT, self.name))
+
+
+class CacheSettingsTests(TestCase):
+    def test_tests_do_not_touch_file_cache(self):
+        """Тесты работают с кешем в памяти, а не с файлами разработчика."""
+        self.assertIsInstance(caches['shared'], LocMemCache)
+
+
+class PkChunksTests(TestCase):
+    def test_chunks_follow_pk_order(self):
+        users = [
+            User.objects.create_user(username=f'user{num}')
+            for num in range(5)
+        ]
+        pks = [user.pk for user in users]
+        queryset = User.objects.order_by('-username')
+        self.assertEqual(
+            list(pk_chunks(queryset, 2)), [pks[:2], pks[2:4], pks[4:]])
+        self.assertEqual(
+            list(pk_chunks(queryset, 3, 'username', after=pks[2])),
+            [[(pks[3], 'user3'), (pks[4], 'user4')]])
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests',
+    },
+})
+class TwoTierCacheTests(TestCase):
+    """Два экземпляра с разной памятью изображают два процесса."""
+
+    def setUp(self):
+        self.shared = caches['shared']
+        self.shared.clear()
+        self.first = self.make_cache('first')
+        self.second = self.make_cache('second')
+
+    def tearDown(self):
+        two_tier_cache._tiers.clear()
+
+    def make_cache(self, location, **options):
+        return TwoTierCache(location, {'OPTIONS': {
+            'SHARED': 'shared', 'SYNC_INTERVAL': 0,
+            'LOCAL_SKIP': ['counter:'], **options,
+        }})
+
+    def test_repeated_reads_served_from_memory(self):
+        self.first.set('key', 'value')
+        self.assertEqual(self.first.get('key'), 'value')
+        with mock.patch.object(
+                self.shared, 'get', wraps=self.shared.get) as shared_get:
+            self.assertEqual(self.first.get('key'), 'value')
+        keys = [call.args[0] for call in shared_get.call_args_list]
+        self.assertNotIn('key', keys)
+
+    def test_write_in_other_process_invalidates_memory(self):
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_incr_reaches_other_processes(self):
+        self.first.add('version', 1, None)
+        self.assertEqual(self.second.get_many(['version']), {'version': 1})
+        self.first.incr('version')
+        self.assertEqual(self.second.get_many(['version']), {'version': 2})
+
+    def test_lost_log_clears_memory(self):
+        self.first.set('key', 'old')
+        self.second.get('key')
+        self.first.set('other', 'value')
+        self.second.get('other')
+        self.shared.clear()
+        self.shared.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+
+    def test_memory_is_bounded_lru(self):
+        cache = self.make_cache('small', MAX_ENTRIES=2)
+        for key in ('a', 'b'):
+            cache.set(key, key)
+            cache.get(key)
+        cache.get('a')
+        cache.set('c', 'c')
+        cache.get('c')
+        self.assertEqual(list(cache.local.entries), [':1:a', ':1:c'])
+
+    def test_memory_entries_expire(self):
+        cache = self.make_cache('short', LOCAL_TIMEOUT=0)
+        cache.set('key', 'old')
+        cache.get('key')
+        self.shared.set('key', 'new')
+        self.assertEqual(cache.get('key'), 'new')
+
+    def test_skipped_keys_bypass_memory(self):
+        self.first.add('counter:hits', 0, None)
+        self.first.get('counter:hits')
+        self.second.incr('counter:hits')
+        self.assertEqual(self.first.get('counter:hits'), 1)
+        self.assertEqual(self.first.local.entries, {})
+        self.assertIsNone(self.shared.get('two-tier:seq'))
+
+    def test_cached_value_is_a_copy(self):
+        self.first.set('key', ['value'])
+        self.first.get('key').append('changed')
+        self.assertEqual(self.first.get('key'), ['value'])
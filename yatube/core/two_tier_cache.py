@@ -0,0 +1,241 @@
+"""Двухуровневый кеш: LRU в памяти процесса перед общим кешем.
+
+Чтение сначала ищет ключ в памяти процесса и идёт в общий кеш (файлы,
+база, memcached — любой бэкенд из CACHES) только при промахе. Записи
+идут сразу в общий кеш, а копия в памяти живёт не дольше LOCAL_TIMEOUT
+секунд и не больше MAX_ENTRIES штук: лишние вытесняются по давности
+использования.
+
+Чтобы другие процессы не отдавали устаревшие копии, каждая запись
+публикуется в канал инвалидации — журнал изменённых ключей в самом
+общем кеше: счётчик '<prefix>seq' и записи '<prefix><номер>'. Процесс
+не чаще раза в SYNC_INTERVAL секунд дочитывает журнал и выбрасывает
+перечисленные ключи; если журнал потерян или процесс отстал больше
+чем на LOG_LENGTH записей, он очищает свою память целиком. Сигналы
+Post, Group, Follow и других моделей уже меняют кеш (версии страниц,
+core.object_cache), так что их изменения доходят до всех процессов.
+
+Номер записи журнала выдаёт incr общего кеша. В memcached и redis он
+атомарен, а в файловом и DB-кеше Django это чтение и запись: два
+процесса, публикующие одновременно, могут получить один номер, и
+запись одного затрёт запись другого. Тогда его ключи останутся в
+памяти остальных процессов до истечения LOCAL_TIMEOUT — файловый кеш
+годится для разработки, на боевом сервере общий кеш должен быть
+memcached или redis.
+
+Ключи с префиксами из LOCAL_SKIP (счётчики и сам журнал) в памяти не
+держатся и в журнал не пишутся. Что бы ни случилось с журналом, копия
+в памяти не старше LOCAL_TIMEOUT секунд.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.two_tier_cache.TwoTierCache',
+            'OPTIONS': {'SHARED': 'shared', 'MAX_ENTRIES': 1000},
+        },
+        'shared': {...},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MISSING = object()
+
+# Память процессов общая для всех потоков: CacheHandler создаёт
+# отдельный экземпляр бэкенда на поток.
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """LRU с TTL в памяти процесса."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.seen = None
+        self.next_sync = 0.0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, data = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout):
+        # Хранится копия: изменения объекта после чтения не портят кеш.
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TwoTierCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        self.log_length = options.get('LOG_LENGTH', 1000)
+        self.log_prefix = options.get('LOG_PREFIX', 'two-tier:')
+        self.local_skip = (
+            self.log_prefix, *options.get('LOCAL_SKIP', ()))
+        with _tiers_lock:
+            self.local = _tiers.setdefault(
+                location or 'default', LocalTier(self._max_entries))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _is_local(self, key):
+        return not key.startswith(self.local_skip)
+
+    # Канал инвалидации.
+
+    def _publish(self, keys, version):
+        keys = [
+            self.make_key(key, version) for key in keys if self._is_local(key)
+        ]
+        if not keys:
+            return
+        self.local.discard(keys)
+        seq_key = self.log_prefix + 'seq'
+        self.shared.add(seq_key, 0, None)
+        try:
+            seq = self.shared.incr(seq_key)
+        except ValueError:
+            # Общий кеш очистили между add и incr; остальные процессы
+            # заметят пропажу журнала и очистят память целиком.
+            return
+        self.shared.set(self.log_prefix + str(seq), keys)
+
+    def _sync(self):
+        local = self.local
+        now = time.monotonic()
+        if now < local.next_sync:
+            return
+        local.next_sync = now + self.sync_interval
+        seq = self.shared.get(self.log_prefix + 'seq', 0)
+        seen, local.seen = local.seen, seq
+        if seen is None or seq == seen:
+            return
+        if seq < seen or seq - seen > self.log_length:
+            local.clear()
+            return
+        log_keys = [self.log_prefix + str(n) for n in range(seen + 1, seq + 1)]
+        log = self.shared.get_many(log_keys)
+        if len(log) < len(log_keys):
+            local.clear()
+            return
+        for keys in log.values():
+            local.discard(keys)
+
+    # Интерфейс BaseCache. Ключи общего кеша — исходные: префикс и
+    # версию к ним добавляет сам общий бэкенд.
+
+    def get(self, key, default=None, version=None):
+        if not self._is_local(key):
+            return self.shared.get(key, default, version)
+        self._sync()
+        local_key = self.make_key(key, version)
+        value = self.local.get(local_key)
+        if value is MISSING:
+            value = self.shared.get(key, MISSING, version)
+            if value is MISSING:
+                return default
+            self.local.set(local_key, value, self.local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = []
+        for key in keys:
+            value = (
+                self.local.get(self.make_key(key, version))
+                if self._is_local(key) else MISSING)
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.shared.get_many(missing, version)
+            for key, value in fetched.items():
+                if self._is_local(key):
+                    self.local.set(
+                        self.make_key(key, version), value, self.local_timeout)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._publish([key], version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        self._publish(data, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._publish([key], version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self._publish([key], version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        self._publish([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version)
+        self._publish(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self):
+        # Журнал пропадает вместе с общим кешем — остальные процессы
+        # очистят память при следующей сверке.
+        self.shared.clear()
+        self.local.clear()
+        self.local.seen = None
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,28 @@
+"""Ограничение размера загружаемых файлов при чтении запроса."""
+from django.core.files.uploadhandler import FileUploadHandler
+
+from yatube.settings import FILE_UPLOAD_MAX_SIZE
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """Пропускает дальше не больше FILE_UPLOAD_MAX_SIZE + 1 байт файла.
+
+    Остаток отбрасывается, не попадая ни в память, ни на диск.
+    По лишнему байту поле формы видит, что файл слишком большой, и
+    возвращает ошибку формы (см. posts.forms.PostForm).
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        allowed = FILE_UPLOAD_MAX_SIZE + 1 - self.received
+        if allowed <= 0:
+            return None
+        chunk = raw_data[:allowed]
+        self.received += len(chunk)
+        return chunk
+
+    def file_complete(self, file_size):
+        return None
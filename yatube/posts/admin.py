@@ -1,14 +1,122 @@
-from django.contrib import admin
+from core.paginator import EstimatedCountPaginator
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import ValidationError
+from django.template.response import TemplateResponse
 
+from yatube.settings import ADMIN_COUNT_LIMIT
+
+from . import bulk, search
 from .models import Comment, Follow, Group, Post
 
 
-class PostAdmin(admin.ModelAdmin):
+class CachedChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField с готовым списком вариантов.
+
+    Обычное поле при выводе каждой строки changelist с list_editable
+    заново читает всю таблицу; здесь варианты читаются один раз на форму
+    и копируются в поля всех строк вместе с полем.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.cached_choices = None
+        super().__init__(*args, **kwargs)
+        self.cached_choices = list(super()._get_choices())
+        self.widget.choices = self.cached_choices
+
+    def _get_choices(self):
+        if self.cached_choices is None:
+            return super()._get_choices()
+        return self.cached_choices
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
+
+
+class MoveToGroupForm(helpers.ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа')
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist без точного COUNT(*) и с пакетным удалением."""
+
+    paginator = EstimatedCountPaginator
+    # Иначе changelist считает ещё и все строки таблицы без фильтров.
+    show_full_result_count = False
+    actions = ['delete_in_chunks']
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            count_limit=ADMIN_COUNT_LIMIT)
+
+    def get_actions(self, request):
+        # Стандартное удаление строит страницу подтверждения со всеми
+        # связанными объектами, на больших выборках она не открывается.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def delete_in_chunks(self, request, queryset):
+        if request.POST.get('post') != 'yes':
+            return TemplateResponse(
+                request, 'admin/posts/delete_in_chunks.html', {
+                    **self.admin_site.each_context(request),
+                    'opts': self.model._meta,
+                    'count': queryset.count(),
+                    'selected': request.POST.getlist(
+                        helpers.ACTION_CHECKBOX_NAME),
+                    'select_across': request.POST.get('select_across'),
+                    'action': request.POST.get('action'),
+                })
+        deleted = bulk.delete(queryset)
+        self.message_user(
+            request, f'Удалено записей: {deleted}.', messages.SUCCESS)
+
+    delete_in_chunks.short_description = 'Удалить выбранные'
+    delete_in_chunks.allowed_permissions = ('delete',)
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
-    search_fields = ('text',)
+    list_select_related = ('author', 'group')
+    search_fields = ('title', 'text')
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
     empty_value_display = '-пусто-'
+    action_form = MoveToGroupForm
+    actions = LargeTableAdmin.actions + ['move_to_group']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице.
+        if not search.match_expression(search_term):
+            return queryset, False
+        return search.filter_matching(queryset, search_term), False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['form_class'] = CachedChoiceField
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def move_to_group(self, request, queryset):
+        try:
+            group = self.action_form.base_fields['group'].clean(
+                request.POST.get('group'))
+        except ValidationError as error:
+            self.message_user(request, error.messages[0], messages.ERROR)
+            return
+        moved = bulk.move_to_group(queryset, group)
+        self.message_user(
+            request,
+            f'Перенесено постов: {moved} в «{group or "без группы"}».',
+            messages.SUCCESS)
+
+    move_to_group.short_description = 'Перенести в группу'
+    move_to_group.allowed_permissions = ('change',)
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -18,12 +126,16 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('pk', 'author', 'text', 'created', 'post')
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('author', 'post')
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
 
 
 admin.site.register(Post, PostAdmin)
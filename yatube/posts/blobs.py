@@ -0,0 +1,51 @@
+"""Счётчики ссылок на файлы картинок (см. ImageBlob и core.storage)."""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from .models import ImageBlob
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name):
+    """Ещё один пост ссылается на файл name."""
+    if not name:
+        return
+    updated = ImageBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, refs=1)
+    except IntegrityError:
+        ImageBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(name):
+    """Пост больше не ссылается на name; последняя ссылка удаляет файл.
+
+    Файлы без строки ImageBlob (загруженные до дедупликации) не
+    трогаются: на них могут ссылаться посты, которых мы не считали.
+    """
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1)
+    deleted, _ = ImageBlob.objects.filter(name=name, refs=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: _delete_file(name))
+
+
+def _delete_file(name):
+    # Тот же файл могли загрузить снова, пока шла транзакция.
+    if ImageBlob.objects.filter(name=name).exists():
+        return
+    try:
+        # По имени, как и в posts.thumbnails: так sorl найдёт миниатюры.
+        delete_with_thumbnails(name)
+    except Exception:
+        # Пост уже удалён; файл подберёт чистка осиротевших файлов.
+        logger.exception('Не удалось удалить файл %s', name)
@@ -0,0 +1,50 @@
+"""Массовые изменения постов пачками (действия админки).
+
+Каждая пачка — отдельный короткий UPDATE или DELETE по списку pk, так
+что действие над миллионом строк не держит одну огромную транзакцию
+и не загружает все объекты в память.
+"""
+from core import object_cache, page_cache
+from core.batches import pk_chunks
+from django.db import transaction
+from django.utils import timezone
+
+from yatube.settings import ADMIN_BULK_CHUNK_SIZE
+
+from . import scopes
+from .models import Group, Post
+from .signals import bump_author_pages
+
+
+def move_to_group(queryset, group, chunk_size=ADMIN_BULK_CHUNK_SIZE):
+    """Переносит посты в group (или убирает из групп при None).
+
+    update() не шлёт сигналов: карточки обновятся сами по новому
+    Post.updated, а кеш объектов и версии страниц групп и авторов
+    сбрасываются здесь.
+    """
+    group_id = group.pk if group is not None else None
+    moved = 0
+    for pks in pk_chunks(queryset, chunk_size):
+        chunk = Post.objects.filter(pk__in=pks)
+        with transaction.atomic():
+            rows = list(chunk.values_list('author_id', 'group_id'))
+            moved += chunk.update(group=group, updated=timezone.now())
+        object_cache.invalidate(Post, pks)
+        group_ids = {row[1] for row in rows} | {group_id}
+        slugs = Group.objects.filter(pk__in=group_ids - {None}).values_list(
+            'slug', flat=True)
+        page_cache.bump(
+            scopes.POSTS, *(scopes.group(slug) for slug in slugs))
+        bump_author_pages(*{row[0] for row in rows})
+    return moved
+
+
+def delete(queryset, chunk_size=ADMIN_BULK_CHUNK_SIZE):
+    """Удаляет строки queryset пачками; сигналы удаления срабатывают."""
+    model = queryset.model
+    deleted = 0
+    for pks in pk_chunks(queryset, chunk_size):
+        _, per_model = model.objects.filter(pk__in=pks).delete()
+        deleted += per_model.get(model._meta.label, 0)
+    return deleted
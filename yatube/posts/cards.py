@@ -0,0 +1,84 @@
+"""Кеш отрендеренных карточек постов.
+
+Карточка хранится под ключом с id поста вместе с версией поста
+(Post.updated), поэтому закешированная страница из 10 карточек не
+ищет миниатюры и не вызывает reverse(). Записи удаляются сигналами
+при изменении поста, его группы, автора или комментариев. Миниатюры
+для непопавших в кеш карточек находятся разом (thumbnails.attach).
+"""
+from core import cache_stats
+from core.batches import pk_chunks
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from . import thumbnails
+
+CARD_TEMPLATES = {
+    'index': 'posts/includes/card_index.html',
+    'group': 'posts/includes/card_group.html',
+    'profile': 'posts/includes/card_profile.html',
+}
+CARD_PRESETS = {
+    'index': 'card',
+    'group': 'detail',
+    'profile': 'profile',
+}
+CARD_TIMEOUT = 60 * 60 * 24
+HITS_KEY = 'post-card:hits'
+MISSES_KEY = 'post-card:misses'
+
+
+def card_key(variant, post_id):
+    return f'post-card:{variant}:{post_id}'
+
+
+def _version(post):
+    return post.updated.isoformat() if post.updated else None
+
+
+def render_cards(posts, variant):
+    """HTML карточек страницы: один get_many и один set_many на страницу."""
+    posts = list(posts)
+    keys = {post.pk: card_key(variant, post.pk) for post in posts}
+    cached = cache.get_many(list(keys.values()))
+    cards = {}
+    stale = []
+    for post in posts:
+        entry = cached.get(keys[post.pk])
+        if entry is not None and entry[0] == _version(post):
+            cards[post.pk] = entry[1]
+        else:
+            stale.append(post)
+    thumbnails.attach(stale, CARD_PRESETS[variant])
+    missed = {}
+    for post in stale:
+        html = render_to_string(CARD_TEMPLATES[variant], {'post': post})
+        cards[post.pk] = html
+        # Карточка с заглушкой вместо миниатюры не кешируется: иначе
+        # она так и показывалась бы до следующей правки поста.
+        if not post.thumbnail_pending:
+            missed[keys[post.pk]] = (_version(post), html)
+    if missed:
+        cache.set_many(missed, CARD_TIMEOUT)
+    cache_stats.count(HITS_KEY, len(posts) - len(stale))
+    cache_stats.count(MISSES_KEY, len(stale))
+    return [cards[post.pk] for post in posts]
+
+
+def invalidate(post_ids):
+    cache.delete_many([
+        card_key(variant, post_id)
+        for post_id in post_ids
+        for variant in CARD_TEMPLATES
+    ])
+
+
+def invalidate_queryset(queryset, chunk_size=500):
+    """Сбрасывает карточки всех постов queryset пачками."""
+    for post_ids in pk_chunks(queryset, chunk_size):
+        invalidate(post_ids)
+
+
+def stats():
+    """Счётчики попаданий и промахов кеша карточек."""
+    return cache_stats.hit_ratio(HITS_KEY, MISSES_KEY)
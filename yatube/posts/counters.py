@@ -0,0 +1,123 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Все изменения — атомарные UPDATE с F(), без чтения значения в Python.
+"""
+from core import object_cache
+from core.batches import pk_chunks
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from yatube.settings import COUNTERS_RECONCILE_CHUNK_SIZE
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def bump_user(user_id, field, delta):
+    """Сдвигает счётчик field пользователя на delta.
+
+    Строка AuthorStats создаётся лениво и только при увеличении: при
+    уменьшении пользователь может удаляться в той же транзакции.
+    """
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta})
+    if updated or delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            AuthorStats.objects.create(user_id=user_id, **{field: delta})
+    except IntegrityError:
+        AuthorStats.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta})
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
+    object_cache.invalidate(Post, [post_id])
+
+
+def stats_for(user):
+    """Счётчики пользователя; нули, если строки ещё нет."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def _fix_users(user_ids):
+    actual = {
+        user_id: {
+            'posts_count': 0, 'followers_count': 0, 'following_count': 0}
+        for user_id in user_ids
+    }
+    sources = (
+        ('posts_count', Post.objects, 'author_id'),
+        ('followers_count', Follow.objects.filter(user__isnull=False),
+         'author_id'),
+        ('following_count', Follow.objects.filter(author__isnull=False),
+         'user_id'),
+    )
+    for field, queryset, column in sources:
+        rows = (
+            queryset.filter(**{f'{column}__in': user_ids})
+            .values(column)
+            .annotate(total=Count('pk'))
+            .values_list(column, 'total')
+        )
+        for user_id, total in rows:
+            actual[user_id][field] = total
+
+    stored = AuthorStats.objects.in_bulk(user_ids)
+    fixed = 0
+    for user_id, values in actual.items():
+        stats = stored.get(user_id)
+        if stats is None:
+            if any(values.values()):
+                AuthorStats.objects.create(user_id=user_id, **values)
+                fixed += 1
+            continue
+        drift = {
+            field: value for field, value in values.items()
+            if getattr(stats, field) != value
+        }
+        if drift:
+            AuthorStats.objects.filter(user_id=user_id).update(**drift)
+            fixed += 1
+    return fixed
+
+
+def _fix_posts(post_ids):
+    actual = dict.fromkeys(post_ids, 0)
+    rows = (
+        Comment.objects.filter(post_id__in=post_ids)
+        .values('post_id')
+        .annotate(total=Count('pk'))
+        .values_list('post_id', 'total')
+    )
+    actual.update(rows)
+    stored = Post.objects.filter(pk__in=post_ids).values_list(
+        'pk', 'comments_count')
+    fixed = 0
+    for post_id, comments_count in stored:
+        if comments_count != actual[post_id]:
+            Post.objects.filter(pk=post_id).update(
+                comments_count=actual[post_id])
+            object_cache.invalidate(Post, [post_id])
+            fixed += 1
+    return fixed
+
+
+def reconcile(chunk_size=COUNTERS_RECONCILE_CHUNK_SIZE):
+    """Пересчитывает счётчики пачками по chunk_size строк.
+
+    Каждая пачка — отдельная короткая транзакция. Возвращает число
+    исправленных пользователей и постов.
+    """
+    fixed_users = fixed_posts = 0
+    for user_ids in pk_chunks(User.objects.all(), chunk_size):
+        with transaction.atomic():
+            fixed_users += _fix_users(user_ids)
+    for post_ids in pk_chunks(Post.objects.all(), chunk_size):
+        with transaction.atomic():
+            fixed_posts += _fix_posts(post_ids)
+    return fixed_users, fixed_posts
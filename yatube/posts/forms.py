@@ -1,5 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from yatube.settings import FILE_UPLOAD_MAX_SIZE
+
+from . import uploads
 from .models import Comment, Post
 
 
@@ -13,6 +17,29 @@ class PostForm(forms.ModelForm):
             'group': ('группа'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Уже сохранённую картинку при редактировании не трогаем.
+        if isinstance(image, UploadedFile):
+            uploads.validate(image)
+            image = uploads.normalize(image)
+            (self.instance.image_placeholder,
+             self.instance.image_color) = uploads.placeholder_for(image)
+        elif not image:
+            self.instance.image_placeholder = ''
+            self.instance.image_color = ''
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = self.files.get(self.add_prefix('image'))
+        if upload is not None and upload.size > FILE_UPLOAD_MAX_SIZE:
+            # Файл обрезан MaxSizeUploadHandler, и ImageField мог счесть
+            # его битым: вместо этого показываем ошибку о размере.
+            self.errors.pop('image', None)
+            self.add_error('image', uploads.too_large_error())
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,25 @@
+"""Пользовательские фрагменты страниц приложения posts (см. core.holes)."""
+from core import holes
+from django.template.loader import render_to_string
+
+from .models import Follow
+
+
+@holes.register('follow_button')
+def follow_button(request, author_username):
+    following = (
+        request.user.is_authenticated
+        and request.user.username != author_username
+        and Follow.objects.filter(
+            user=request.user, author__username=author_username).exists()
+    )
+    return render_to_string('posts/includes/follow_button.html', {
+        'author_username': author_username,
+        'following': following,
+    }, request=request)
+
+
+@holes.register('switcher')
+def switcher(request, active):
+    return render_to_string(
+        'posts/includes/switcher.html', {active: True}, request=request)
@@ -0,0 +1,86 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters, timeline
+from posts.models import Follow, Post, TimelineEntry
+from yatube.settings import POSTS_ON_INDEX, TIMELINE_FANOUT_THRESHOLD
+
+User = get_user_model()
+
+PURE_PUSH = 10 ** 12
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает чистый fan-out и гибридную ленту: сколько строк '
+        'пишется на один пост и сколько стоит чтение /follow/. '
+        'Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=5000)
+        parser.add_argument('--authors', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--threshold', type=int, default=TIMELINE_FANOUT_THRESHOLD)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        reader, star_post = self.populate(options)
+        modes = (
+            ('push', PURE_PUSH),
+            (f'hybrid (порог {options["threshold"]})', options['threshold']),
+        )
+        self.stdout.write(
+            f'{"режим":<24}{"строк на пост":>16}{"запись, мс":>14}'
+            f'{"чтение, мс":>14}')
+        for name, threshold in modes:
+            TimelineEntry.objects.filter(post=star_post).delete()
+            started = time.perf_counter()
+            written = timeline.fan_out(star_post, threshold=threshold)
+            write_ms = (time.perf_counter() - started) * 1000
+
+            timeline.rebuild(user_ids=[reader.pk], threshold=threshold)
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                paginator = timeline.feed_paginator(
+                    reader, POSTS_ON_INDEX, threshold=threshold)
+                list(paginator.get_page())
+            read_ms = (
+                (time.perf_counter() - started) * 1000 / options['repeat'])
+            self.stdout.write(
+                f'{name:<24}{written:>16}{write_ms:>14.2f}{read_ms:>14.2f}')
+
+    def populate(self, options):
+        User.objects.bulk_create(
+            User(username=f'bench-{num}')
+            for num in range(options['followers'] + options['authors'] + 1)
+        )
+        users = list(User.objects.filter(
+            username__startswith='bench-').order_by('pk'))
+        reader, star = users[0], users[1]
+        authors = users[1:options['authors'] + 1]
+        followers = users[options['authors'] + 1:]
+
+        Follow.objects.bulk_create(
+            [Follow(user=reader, author=author) for author in authors]
+            + [Follow(user=user, author=star) for user in followers]
+        )
+        Post.objects.bulk_create(
+            Post(author=author, text=f'bench {num}', image='posts/bench.jpg')
+            for author in authors
+            for num in range(options['posts'])
+        )
+        # bulk_create не шлёт сигналов: без пересчёта у авторов нет
+        # AuthorStats, и «тяжёлым» не окажется никто.
+        counters.reconcile()
+        star_post = Post.objects.filter(author=star).order_by('-pk')[0]
+        return reader, star_post
@@ -0,0 +1,147 @@
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+
+from posts import presets, thumbnails
+from posts.models import Post
+from yatube.settings import POSTS_ON_INDEX
+
+User = get_user_model()
+
+
+class CountingCache:
+    """Обёртка над кешем: считает обращения и добавляет задержку сети."""
+
+    def __init__(self, cache, rtt):
+        self.cache = cache
+        self.rtt = rtt
+        self.calls = 0
+
+    def _round_trip(self):
+        self.calls += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def get(self, *args, **kwargs):
+        self._round_trip()
+        return self.cache.get(*args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        self._round_trip()
+        return self.cache.get_many(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск миниатюр ленты по одной ({% thumbnail %}) и '
+        'одним get_many: обращения к кешу, SQL и время на страницу. '
+        'Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--preset', default='card',
+                            choices=sorted(presets.PRESETS))
+        parser.add_argument(
+            '--rtt-ms', type=float, default=0.5,
+            help='Задержка одного обращения к кешу, как у memcached/redis.')
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                with transaction.atomic():
+                    self.run(options)
+                    transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def run(self, options):
+        preset = options['preset']
+        geometries = [
+            presets.geometry(preset, density)
+            for density in presets.DENSITIES
+        ]
+        pages = self.populate(options, geometries)
+        kv_cache = CountingCache(
+            thumbnails._kv_cache(), options['rtt_ms'] / 1000)
+        modes = (
+            ('по одной', lambda posts: [
+                get_thumbnail(post.image.name, geometry,
+                              **thumbnails.THUMBNAIL_OPTIONS)
+                for post in posts
+                for geometry in geometries
+            ]),
+            ('get_many', lambda posts: thumbnails.attach(posts, preset)),
+        )
+        self.stdout.write(
+            f'{"режим":<12}{"кеш на стр.":>14}{"SQL на стр.":>14}'
+            f'{"мс на стр.":>14}')
+        for name, resolve in modes:
+            # Прогрев: меряем страницы, миниатюры которых уже в кеше.
+            for posts in pages:
+                resolve(posts)
+            kv_cache.calls = 0
+            with CaptureQueriesContext(connection) as queries, \
+                    _patched_kv_cache(kv_cache):
+                started = time.perf_counter()
+                for posts in pages:
+                    resolve(posts)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name:<12}{kv_cache.calls / len(pages):>14.1f}'
+                f'{len(queries) / len(pages):>14.1f}'
+                f'{elapsed * 1000 / len(pages):>14.2f}')
+
+    def populate(self, options, geometries):
+        author, _ = User.objects.get_or_create(username='bench-thumbnails')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'bench {num}',
+                 image=f'posts/bench-{num}.png')
+            for num in range(options['posts'])
+        )
+        # Картинки и миниатюры нужны только постам измеряемых страниц.
+        posts = list(
+            Post.objects.filter(author=author)
+            .order_by('-pub_date', '-id')[:options['pages'] * POSTS_ON_INDEX])
+        content = _png()
+        for post in posts:
+            default.storage.save(post.image.name, ContentFile(content))
+            for geometry in geometries:
+                get_thumbnail(post.image.name, geometry,
+                              **thumbnails.THUMBNAIL_OPTIONS)
+        return [
+            posts[start:start + POSTS_ON_INDEX]
+            for start in range(0, len(posts), POSTS_ON_INDEX)
+        ]
+
+
+@contextmanager
+def _patched_kv_cache(kv_cache):
+    """Подменяет кеш kvstore sorl и posts.thumbnails на счётчик."""
+    with mock.patch.object(KVStore, 'cache', new_callable=mock.PropertyMock,
+                           return_value=kv_cache), \
+            mock.patch.object(thumbnails, '_kv_cache', return_value=kv_cache):
+        yield
+
+
+def _png():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
@@ -0,0 +1,82 @@
+import os
+import re
+
+from core import object_cache
+from core.storage import content_hash, content_name
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from posts import thumbnails
+from posts.models import ImageBlob, Post
+
+CONTENT_NAME_RE = re.compile(r'/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переименовывает картинки постов по хешу содержимого, удаляет '
+        'дубликаты и пересчитывает ссылки ImageBlob.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать дубликаты, ничего не меняя.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = dict.fromkeys(thumbnails.image_names(options['chunk_size']))
+        moved = duplicates = missing = freed = 0
+        targets = set()
+        for name in names:
+            if CONTENT_NAME_RE.search(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            with storage.open(name) as content:
+                target = content_name(
+                    os.path.dirname(name), content_hash(content), name)
+            duplicate = target in targets or storage.exists(target)
+            targets.add(target)
+            if duplicate:
+                duplicates += 1
+                freed += storage.size(name)
+            else:
+                moved += 1
+            if options['dry_run']:
+                continue
+            if not duplicate:
+                os.makedirs(
+                    os.path.dirname(storage.path(target)), exist_ok=True)
+                os.replace(storage.path(name), storage.path(target))
+            posts = Post.objects.filter(image=name)
+            pks = list(posts.values_list('pk', flat=True))
+            posts.update(image=target, updated=timezone.now())
+            object_cache.invalidate(Post, pks)
+            # Миниатюры старого имени больше не нужны; файл уже перенесён.
+            delete_with_thumbnails(name, delete_file=duplicate)
+        if not options['dry_run']:
+            self.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Переименовано: {moved}, дубликатов удалено: {duplicates} '
+            f'({freed // 1024} КБ), нет файла: {missing}'))
+
+    @transaction.atomic
+    def recount(self):
+        ImageBlob.objects.all().delete()
+        rows = (
+            Post.objects.exclude(image='').values('image')
+            .annotate(refs=Count('id')).order_by()
+        )
+        ImageBlob.objects.bulk_create(
+            (ImageBlob(name=row['image'], refs=row['refs']) for row in rows),
+            batch_size=500,
+        )
@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from core import object_cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит недостающие миниатюры и заглушки для уже загруженных '
+        'картинок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Сколько процессов запускает Pillow параллельно.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Сколько постов читать из БД за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        names = list(thumbnails.image_names(options['chunk_size']))
+        # Дочерние процессы не должны делить открытые соединения с БД.
+        connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            results = pool.map(thumbnails.backfill_one, names, chunksize=16)
+            for name, error, placeholder in results:
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(error)
+                    continue
+                image_placeholder, image_color = placeholder
+                posts = Post.objects.filter(image=name, image_placeholder='')
+                pks = list(posts.values_list('pk', flat=True))
+                posts.update(
+                    image_placeholder=image_placeholder,
+                    image_color=image_color,
+                    updated=timezone.now(),
+                )
+                object_cache.invalidate(Post, pks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок обработано: {len(names) - failed}, '
+            f'с ошибками: {failed}'))
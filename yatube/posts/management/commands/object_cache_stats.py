@@ -0,0 +1,12 @@
+from core import object_cache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кеша постов, групп и авторов.'
+
+    def handle(self, *args, **options):
+        stats = object_cache.stats()
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {stats["hit_ratio"]:.1%}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает поисковый индекс постов, например после '
+        'bulk_create или update(), которые не шлют сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from yatube.settings import TIMELINE_REBUILD_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок из Follow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TIMELINE_REBUILD_BATCH_SIZE,
+            help='Сколько читателей обрабатывать за один проход.',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='id читателя, чью ленту нужно пересобрать (можно повторять).',
+        )
+
+    def handle(self, *args, **options):
+        processed = timeline.rebuild(
+            batch_size=options['batch_size'],
+            user_ids=options['user_ids'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано подписок: {processed}'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from yatube.settings import COUNTERS_RECONCILE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=COUNTERS_RECONCILE_CHUNK_SIZE,
+            help='Сколько строк пересчитывать в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        fixed_users, fixed_posts = counters.reconcile(
+            chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено пользователей: {fixed_users}, '
+            f'постов: {fixed_posts}'))
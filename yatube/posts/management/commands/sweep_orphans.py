@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import sweeper
+from yatube.settings import (SWEEP_CHUNK_SIZE, SWEEP_MIN_AGE,
+                             SWEEP_STATE_FILE)
+
+# Порядок фаз важен: сначала исходники, потом их миниатюры.
+PHASES = ('images', 'thumbnails', 'comments', 'follows')
+
+
+class Command(BaseCommand):
+    help = (
+        'Пачками удаляет файлы, на которые не ссылается ни один пост, '
+        'и комментарии и подписки, потерявшие пост или пользователя. '
+        'Прерванная чистка продолжается с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=SWEEP_CHUNK_SIZE,
+            help='Сколько файлов или строк обрабатывать за один заход.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=SWEEP_MIN_AGE,
+            help='Файлы моложе стольких секунд не удаляются.',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Пауза между пачками в секундах, чтобы не нагружать сайт.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать, ничего не удаляя.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать сначала, забыв сохранённую точку.',
+        )
+        parser.add_argument('--state-file', default=SWEEP_STATE_FILE)
+
+    def handle(self, *args, **options):
+        self.options = options
+        state_file = options['state_file']
+        # Пробный прогон не должен сдвигать точку настоящей чистки.
+        resume = not options['restart'] and not options['dry_run']
+        state = self.load(state_file) if resume else {}
+        root = settings.MEDIA_ROOT
+        chunk_size = options['chunk_size']
+        min_age = options['min_age']
+        dry_run = options['dry_run']
+        runs = {
+            'images': lambda after: sweeper.sweep_images(
+                root, 'posts', chunk_size, min_age, after or '', dry_run),
+            'thumbnails': lambda after: sweeper.sweep_thumbnails(
+                root, chunk_size, min_age, after or '', dry_run),
+            'comments': lambda after: sweeper.sweep_rows(
+                sweeper.dangling_comments(), chunk_size, after or 0,
+                dry_run),
+            'follows': lambda after: sweeper.sweep_rows(
+                sweeper.dangling_follows(), chunk_size, after or 0,
+                dry_run),
+        }
+        for phase in PHASES:
+            if state.get(phase, {}).get('done'):
+                continue
+            progress = state.setdefault(
+                phase, {'position': None, 'deleted': 0, 'freed': 0})
+            for step in runs[phase](progress['position']):
+                progress['position'] = step.position
+                progress['deleted'] += step.deleted
+                progress['freed'] += step.freed
+                if not dry_run:
+                    self.save(state_file, state)
+                if options['pause']:
+                    time.sleep(options['pause'])
+            progress['done'] = True
+            if not dry_run:
+                self.save(state_file, state)
+        if not dry_run and os.path.exists(state_file):
+            os.remove(state_file)
+        self.report(state)
+
+    def load(self, state_file):
+        try:
+            with open(state_file) as stream:
+                return json.load(stream)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, state_file, state):
+        # Через временный файл: прерывание не оставит половину JSON.
+        temporary = state_file + '.tmp'
+        with open(temporary, 'w') as stream:
+            json.dump(state, stream)
+        os.replace(temporary, state_file)
+
+    def report(self, state):
+        files = state['images']['deleted'] + state['thumbnails']['deleted']
+        freed = state['images']['freed'] + state['thumbnails']['freed']
+        prefix = 'Будет удалено' if self.options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: файлов {files} ({freed // 1024} КБ), '
+            f'комментариев {state["comments"]["deleted"]}, '
+            f'подписок {state["follows"]["deleted"]}'))
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    stats = User.objects.annotate(
+        posts_total=Count('posts', distinct=True),
+        followers_total=Count('following__user', distinct=True),
+        following_total=Count('follower__author', distinct=True),
+    ).values_list('pk', 'posts_total', 'followers_total', 'following_total')
+    AuthorStats.objects.bulk_create(
+        AuthorStats(
+            user_id=pk,
+            posts_count=posts_total,
+            followers_count=followers_total,
+            following_count=following_total,
+        )
+        for pk, posts_total, followers_total, following_total in stats.iterator()
+    )
+    for pk, total in Post.objects.annotate(
+            total=Count('comments')).filter(total__gt=0).values_list(
+                'pk', 'total').iterator():
+        Post.objects.filter(pk=pk).update(comments_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0016_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.AddIndex(
+            model_name='authorstats',
+            index=models.Index(fields=['followers_count'], name='stats_followers_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:40
+
+from django.db import migrations
+
+# Индекс FTS5 с внешним содержимым: тексты не дублируются, индекс
+# хранит только термы и ссылается на posts_post по rowid = id.
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+    title, text,
+    content='posts_post', content_rowid='id',
+    tokenize='unicode61'
+)
+"""
+# Совпадение в заголовке весит вдесятеро больше, чем в тексте.
+SET_RANK = """
+INSERT INTO posts_post_fts(posts_post_fts, rank)
+VALUES ('rank', 'bm25(10.0, 1.0)')
+"""
+REBUILD_INDEX = """
+INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_image_blobs'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [CREATE_INDEX, SET_RANK, REBUILD_INDEX],
+            reverse_sql='DROP TABLE posts_post_fts',
+        ),
+    ]
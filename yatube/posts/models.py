@@ -1,4 +1,5 @@
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 from django.contrib.auth import get_user_model
 from django.db import models
 
@@ -33,7 +34,8 @@ class Post(CreatedModel):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -41,6 +43,7 @@ class Post(CreatedModel):
         related_name='posts',
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='Группа',
         help_text='Группа поста'
     )
@@ -48,16 +51,45 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=False
     )
+    # Показываются на месте картинки, пока она не загрузилась.
+    image_placeholder = models.TextField(
+        'Заглушка картинки', blank=True, editable=False)
+    image_color = models.CharField(
+        'Основной цвет картинки', max_length=7, blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
 
     def __str__(self):
         return self.text[:20]
 
+    def save(self, *args, **kwargs):
+        # comments_count меняется только через F(): сохранение устаревшего
+        # экземпляра не должно затирать параллельно добавленные комментарии.
+        if not self._state.adding and not kwargs.get('update_fields'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name_plural = 'Посты'
         verbose_name = 'Пост'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -67,6 +99,7 @@ class Comment(models.Model):
         related_name='comments',
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='Пост',
         help_text='Пост, к которому будет оставлен комментарий'
     )
@@ -91,6 +124,12 @@ class Comment(models.Model):
     class Meta:
         verbose_name_plural = 'Комментарии'
         verbose_name = 'Комментарий'
+        indexes = [
+            # Keyset-пагинация комментариев поста по (created, id).
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_id_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -100,6 +139,7 @@ class Follow(models.Model):
         related_name='follower',
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='Имя подписчика',
     )
     author = models.ForeignKey(
@@ -108,6 +148,7 @@ class Follow(models.Model):
         related_name='following',
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='Имя автора',
     )
 
@@ -119,3 +160,93 @@ class Follow(models.Model):
                 fields=['user', 'author'],
                 name='unique_following')
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: строка на пару (читатель, пост)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста',
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name_plural = 'Записи лент'
+        verbose_name = 'Запись ленты'
+        ordering = ('-pub_date', '-post')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Обновляются через F() при создании и удалении постов и подписок;
+    расхождения исправляет команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name_plural = 'Счётчики пользователей'
+        verbose_name = 'Счётчики пользователя'
+        indexes = [
+            models.Index(
+                fields=['followers_count'], name='stats_followers_idx'),
+        ]
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются.
+
+    Одинаковые картинки хранятся один раз (core.storage): файл можно
+    удалить, только когда на него не ссылается ни один пост.
+    """
+    name = models.CharField('Имя файла', max_length=100, unique=True)
+    refs = models.PositiveIntegerField('Число ссылок', default=0)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
@@ -0,0 +1,39 @@
+"""Именованные размеры картинок постов.
+
+Размер пресета — это размер блока, в котором картинка показывается на
+странице, в CSS-пикселях. Для каждого пресета готовятся миниатюры на
+все плотности из DENSITIES, шаблон отдаёт их браузеру через srcset.
+"""
+from collections import namedtuple
+
+Preset = namedtuple('Preset', ['width', 'height'])
+
+PRESETS = {
+    # Карточка на главной: блок .post_image2 239x200.
+    'card': Preset(239, 200),
+    # Страница поста и лента группы: блок .post_image шириной 350px.
+    'detail': Preset(350, None),
+    # Карточка профиля шириной 18rem.
+    'profile': Preset(288, None),
+    # Лента подписок: картинка во всю ширину колонки.
+    'banner': Preset(960, 339),
+}
+DENSITIES = (1, 2)
+
+
+def geometry(name, density=1):
+    """Строка размера sorl-thumbnail для пресета и плотности экрана."""
+    preset = PRESETS[name]
+    width = preset.width * density
+    if preset.height is None:
+        return str(width)
+    return f'{width}x{preset.height * density}'
+
+
+def all_geometries():
+    """Все размеры, которые нужны шаблонам, без повторов."""
+    return list(dict.fromkeys(
+        geometry(name, density)
+        for name in PRESETS
+        for density in DENSITIES
+    ))
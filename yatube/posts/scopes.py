@@ -0,0 +1,26 @@
+"""Области версионного кеша страниц (см. core.page_cache)."""
+
+# Все посты: главная страница.
+POSTS = 'posts'
+# Любая группа: название группы выводится на страницах групп и в профилях.
+GROUPS = 'groups'
+
+
+def group(slug):
+    return f'group:{slug}'
+
+
+def author(username):
+    return f'author:{username}'
+
+
+def index_page(request):
+    return [POSTS]
+
+
+def group_page(request, slug):
+    return [GROUPS, group(slug)]
+
+
+def profile_page(request, username):
+    return [GROUPS, author(username)]
@@ -0,0 +1,134 @@
+"""Полнотекстовый поиск по постам (SQLite FTS5).
+
+Индекс posts_post_fts (миграция 0021) хранит термы заголовков и
+текстов, сами строки читаются из posts_post. Индекс обновляется
+сигналами в той же транзакции, что и пост; для индекса с внешним
+содержимым удаление требует старых значений полей, их достаёт
+pre_save. bulk_create и update() сигналов не шлют: после них индекс
+перестраивается командой rebuild_search_index.
+
+Выдача сортируется по bm25 (rank), а страницы листаются курсором по
+(rank, id), так что следующая страница не пересчитывает предыдущие.
+"""
+import re
+
+from core.paginator import CursorPaginator
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+# Больше слов в запросе только замедляет поиск, почти не сужая выдачу.
+MAX_TERMS = 10
+TERM_RE = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Запрос FTS5 из пользовательской строки: все слова сразу (AND).
+
+    Каждое слово берётся в кавычки, поэтому операторы и скобки FTS5 из
+    строки поиска не интерпретируются и не ломают запрос.
+    """
+    terms = TERM_RE.findall(query.lower())[:MAX_TERMS]
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def index(pk, title, text):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, text) VALUES (%s, %s, %s)',
+            [pk, title, text])
+
+
+def unindex(pk, title, text):
+    """Убирает из индекса старые значения полей поста."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text) '
+            f"VALUES ('delete', %s, %s, %s)",
+            [pk, title, text])
+
+
+def rebuild():
+    """Строит индекс заново по текущему содержимому posts_post."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def filter_matching(queryset, query):
+    """Посты queryset, найденные индексом по query."""
+    # filter(pk__in=RawSQL(...)) в Django 2.2 берёт подзапрос в двойные
+    # скобки, и SQLite сравнивает pk только с первой найденной строкой;
+    # поэтому условие целиком — логическое выражение.
+    matched = RawSQL(
+        f'{Post._meta.db_table}.id IN '
+        f'(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+        [match_expression(query)], output_field=BooleanField())
+    return queryset.annotate(search_matched=matched).filter(
+        search_matched=True)
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная пагинация результатов поиска по (rank, id)."""
+
+    def __init__(self, query, per_page, **kwargs):
+        self.expression = match_expression(query)
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page,
+            ordering=('rank', 'id'), **kwargs)
+
+    @cached_property
+    def count(self):
+        if not self.expression:
+            return 0
+        return self._select('COUNT(*)', '', [])[0][0]
+
+    def fetch_after(self, values, forward, limit):
+        rank, pk = values
+        if forward:
+            where = 'AND (rank > %s OR (rank = %s AND rowid > %s))'
+            order = 'ORDER BY rank, rowid'
+        else:
+            where = 'AND (rank < %s OR (rank = %s AND rowid < %s))'
+            order = 'ORDER BY rank DESC, rowid DESC'
+        return self._posts(self._select(
+            'rank, rowid', f'{where} {order} LIMIT %s',
+            [rank, rank, pk, limit]))
+
+    def fetch_slice(self, offset, limit):
+        return self._posts(self._select(
+            'rank, rowid', 'ORDER BY rank, rowid LIMIT %s OFFSET %s',
+            [limit, offset]))
+
+    def key(self, row):
+        return row[0]
+
+    def cursor_values(self, raw_values):
+        rank, pk = raw_values
+        return float(rank), int(pk)
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        page = super()._build_page(rows, number, has_next, has_previous)
+        page.object_list = [post for _, post in page.object_list]
+        return page
+
+    def _select(self, columns, tail, params):
+        if not self.expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {columns} FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s {tail}',
+                [self.expression, *params])
+            return cursor.fetchall()
+
+    def _posts(self, rows):
+        """Пары ((rank, id), пост) в порядке выдачи индекса."""
+        posts = self.object_list.in_bulk([pk for _, pk in rows])
+        return [
+            ((rank, pk), posts[pk]) for rank, pk in rows if pk in posts
+        ]
@@ -0,0 +1,169 @@
+from core import object_cache, page_cache
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import blobs, cards, counters, scopes, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+object_cache.register(Post, Group)
+# Хеш пароля, почта и права не должны попадать в общий кеш.
+object_cache.register(User, fields=('username', 'first_name', 'last_name'))
+
+# Поля пользователя, которые выводятся в карточках постов.
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def _usernames(*user_ids):
+    return User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True)
+
+
+def bump_post_pages(post, *group_ids):
+    """Новые версии страниц, на которых виден пост."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True) if group_ids else []
+    page_cache.bump(
+        scopes.POSTS,
+        *(scopes.author(username) for username in _usernames(
+            post.author_id)),
+        *(scopes.group(slug) for slug in slugs),
+    )
+
+
+def bump_author_pages(*user_ids):
+    page_cache.bump(
+        *(scopes.author(username) for username in _usernames(*user_ids)))
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # При переносе поста в другую группу меняется и старая лента группы,
+    # при замене картинки освобождается ссылка на старый файл, а старые
+    # заголовок и текст нужны, чтобы убрать их из поискового индекса.
+    instance.previous_group_id = None
+    instance.previous_image = ''
+    instance.previous_search = None
+    if instance._state.adding:
+        return
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'image', 'title', 'text').first()
+    if previous is not None:
+        group_id, image, title, text = previous
+        instance.previous_group_id = group_id
+        instance.previous_image = image
+        instance.previous_search = (title, text)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    else:
+        cards.invalidate([instance.pk])
+    previous_image = getattr(instance, 'previous_image', '')
+    if instance.image.name != previous_image:
+        blobs.acquire(instance.image.name)
+        blobs.release(previous_image)
+    previous_search = getattr(instance, 'previous_search', None)
+    if previous_search != (instance.title, instance.text):
+        if previous_search is not None:
+            search.unindex(instance.pk, *previous_search)
+        search.index(instance.pk, instance.title, instance.text)
+    bump_post_pages(instance, getattr(instance, 'previous_group_id', None))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    cards.invalidate([instance.pk])
+    blobs.release(instance.image.name)
+    search.unindex(instance.pk, instance.title, instance.text)
+    bump_post_pages(instance)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created:
+        cards.invalidate_queryset(instance.posts.all())
+    page_cache.bump(scopes.GROUPS)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # После удаления у постов уже не будет group_id, поэтому pre_delete.
+    cards.invalidate_queryset(instance.posts.all())
+    page_cache.bump(scopes.GROUPS)
+
+
+def _card_fields_changed(update_fields):
+    return not update_fields or bool(CARD_USER_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # Закешированные страницы профиля лежат под старым именем.
+    instance.previous_username = None
+    if instance._state.adding or not _card_fields_changed(update_fields):
+        return
+    instance.previous_username = User.objects.filter(
+        pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or not _card_fields_changed(update_fields):
+        return
+    cards.invalidate_queryset(instance.posts.all())
+    # Имя и ссылка на профиль автора есть и в карточках лент групп.
+    slugs = Group.objects.filter(posts__author=instance).values_list(
+        'slug', flat=True).distinct()
+    usernames = {instance.username, getattr(
+        instance, 'previous_username', None)} - {None}
+    page_cache.bump(
+        *(scopes.author(username) for username in usernames),
+        *(scopes.group(slug) for slug in slugs))
+
+
+def _comment_changed(post_id, delta):
+    counters.bump_comments(post_id, delta)
+    cards.invalidate([post_id])
+    page_cache.bump(*(
+        scopes.author(username) for username in User.objects.filter(
+            posts__pk=post_id).values_list('username', flat=True)
+    ))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        _comment_changed(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        _comment_changed(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created and instance.user_id and instance.author_id:
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        bump_author_pages(instance.author_id, instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        was_heavy = timeline.is_heavy(instance.author_id)
+        counters.bump_user(instance.author_id, 'followers_count', -1)
+        counters.bump_user(instance.user_id, 'following_count', -1)
+        timeline.prune(instance.user_id, instance.author_id)
+        if was_heavy:
+            timeline.refill(instance.author_id)
+        bump_author_pages(instance.author_id, instance.user_id)
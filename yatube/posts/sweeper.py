@@ -0,0 +1,153 @@
+"""Чистка осиротевших файлов и строк пачками.
+
+Каталоги MEDIA_ROOT обходятся потоком в лексикографическом порядке,
+таблицы — по возрастанию pk, поэтому после каждой пачки известна точка,
+с которой можно продолжить. Каждая пачка удаляется отдельным коротким
+запросом без общей транзакции: чистку можно запускать на живом сайте.
+
+Свежие файлы (моложе min_age) не трогаются: картинка сохраняется в
+хранилище раньше, чем фиксируется строка поста. Ссылки на каждый
+файл перепроверяются непосредственно перед его удалением.
+"""
+import os
+import time
+from collections import namedtuple
+
+from core.batches import pk_chunks
+from django.db import transaction
+from django.db.models import Q
+from sorl.thumbnail import default
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from .models import Comment, Follow, ImageBlob, Post
+
+# Итог одной пачки: до какого места дошли, сколько удалено и освобождено.
+Progress = namedtuple('Progress', ['position', 'deleted', 'freed'])
+
+StoredFile = namedtuple('StoredFile', ['name', 'size', 'mtime'])
+
+
+def walk(root, directory, after=''):
+    """Файлы каталога по возрастанию полного имени, после after."""
+    base = os.path.join(root, directory)
+    if not os.path.isdir(base):
+        return
+    yield from _walk(root, base, after)
+
+
+def _walk(root, path, after):
+    with os.scandir(path) as entries:
+        # Каталог «a» сортируется как «a/», чтобы порядок совпал с
+        # порядком полных имён: «a.gif» < «a/b.gif».
+        entries = sorted(
+            entries,
+            key=lambda entry: entry.name + ('/' if entry.is_dir() else ''))
+    for entry in entries:
+        name = os.path.relpath(entry.path, root).replace(os.sep, '/')
+        if entry.is_dir(follow_symlinks=False):
+            # Каталоги целиком до точки продолжения пропускаются.
+            if name + '/' >= after[:len(name) + 1]:
+                yield from _walk(root, entry.path, after)
+        elif name > after:
+            stat = entry.stat()
+            yield StoredFile(name, stat.st_size, stat.st_mtime)
+
+
+def _chunks(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _old_enough(files, min_age):
+    deadline = time.time() - min_age
+    return [stored for stored in files if stored.mtime < deadline]
+
+
+def _release_orphan(name):
+    """Проверяет перед самым удалением, что файл всё ещё ничей.
+
+    Повторная загрузка тех же байтов переиспользует файл со старым
+    mtime (core.storage), поэтому min_age её не защищает: пост мог
+    сохраниться уже после проверки пачки. Строка ImageBlob удаляется
+    только без ссылок.
+    """
+    with transaction.atomic():
+        if Post.objects.filter(image=name).exists():
+            return False
+        if ImageBlob.objects.filter(name=name, refs__gt=0).exists():
+            return False
+        ImageBlob.objects.filter(name=name, refs=0).delete()
+    return True
+
+
+def sweep_images(root, directory, chunk_size, min_age, after='',
+                 dry_run=False):
+    """Удаляет исходники картинок, на которые не ссылается ни один пост."""
+    for chunk in _chunks(walk(root, directory, after), chunk_size):
+        names = [stored.name for stored in chunk]
+        referenced = set(
+            Post.objects.filter(image__in=names)
+            .values_list('image', flat=True))
+        orphans = [
+            stored for stored in _old_enough(chunk, min_age)
+            if stored.name not in referenced
+        ]
+        if not dry_run:
+            orphans = [
+                stored for stored in orphans if _release_orphan(stored.name)]
+            for stored in orphans:
+                delete_with_thumbnails(stored.name)
+        yield Progress(
+            names[-1], len(orphans), sum(stored.size for stored in orphans))
+
+
+def sweep_thumbnails(root, chunk_size, min_age, after='', dry_run=False):
+    """Удаляет миниатюры, о которых не знает kvstore sorl."""
+    storage = default.storage
+    directory = thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/')
+    for chunk in _chunks(walk(root, directory, after), chunk_size):
+        keys = {
+            add_prefix(ImageFile(stored.name, storage).key): stored
+            for stored in chunk
+        }
+        known = set(
+            KVStore.objects.filter(key__in=list(keys))
+            .values_list('key', flat=True))
+        old = set(_old_enough(chunk, min_age))
+        orphans = [
+            stored for key, stored in keys.items()
+            if key not in known and stored in old
+        ]
+        if not dry_run:
+            for stored in orphans:
+                storage.delete(stored.name)
+        yield Progress(
+            chunk[-1].name, len(orphans),
+            sum(stored.size for stored in orphans))
+
+
+def sweep_rows(queryset, chunk_size, after=0, dry_run=False):
+    """Удаляет строки queryset пачками по возрастанию pk."""
+    for pks in pk_chunks(queryset, chunk_size, after=after):
+        deleted = len(pks)
+        if not dry_run:
+            deleted, _ = queryset.model.objects.filter(pk__in=pks).delete()
+        yield Progress(pks[-1], deleted, 0)
+
+
+def dangling_comments():
+    return Comment.objects.filter(post__isnull=True)
+
+
+def dangling_follows():
+    return Follow.objects.filter(Q(user__isnull=True) | Q(author__isnull=True))
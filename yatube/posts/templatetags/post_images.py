@@ -0,0 +1,13 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def preset_image(image, preset):
+    """{% preset_image post.image 'detail' as im %}: im.url и im.srcset."""
+    if not image:
+        return None
+    return thumbnails.preset_images([image.name], preset).get(image.name)
@@ -0,0 +1,92 @@
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'group-{number}',
+                description='Описание')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def create_posts(self, count, **kwargs):
+        return [
+            Post.objects.create(
+                author=self.admin, title='Пост', text='Текст', **kwargs)
+            for _ in range(count)
+        ]
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Авторы, группы и варианты групп читаются не построчно."""
+        self.create_posts(2, group=self.groups[0])
+        few = self.changelist_queries()
+        self.create_posts(20, group=self.groups[1])
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_unfiltered_count_is_estimated(self):
+        """Без фильтров число строк берётся по MAX(pk), без COUNT(*)."""
+        posts = self.create_posts(3)
+        posts[0].delete()
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.context['cl'].result_count, posts[-1].pk)
+        response = self.client.get(self.url, {'q': 'текст'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_move_to_group(self):
+        posts = self.create_posts(3, group=self.groups[0])
+        response = self.client.post(self.url, {
+            'action': 'move_to_group',
+            'group': self.groups[2].pk,
+            helpers.ACTION_CHECKBOX_NAME: [posts[0].pk, posts[1].pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            self.groups[2].posts.count(), 2)
+        self.assertEqual(self.groups[0].posts.get(), posts[2])
+
+    def test_delete_asks_for_confirmation(self):
+        posts = self.create_posts(3)
+        Comment.objects.create(post=posts[0], author=self.admin, text='Да')
+        data = {
+            'action': 'delete_in_chunks',
+            helpers.ACTION_CHECKBOX_NAME: [posts[0].pk, posts[1].pk],
+        }
+        response = self.client.post(self.url, data)
+        self.assertContains(response, '2 шт.')
+        self.assertEqual(Post.objects.count(), 3)
+        response = self.client.post(self.url, {**data, 'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertQuerysetEqual(
+            Post.objects.all(), [posts[2]], transform=lambda post: post)
+        self.assertFalse(Comment.objects.filter(post__isnull=False).exists())
+
+    def test_change_form_opens(self):
+        post = self.create_posts(1, group=self.groups[0])[0]
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=[post.pk]))
+        self.assertContains(response, 'Группа 0')
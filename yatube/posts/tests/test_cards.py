@@ -0,0 +1,77 @@
+from unittest import mock
+
+from core import page_cache
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import cards, scopes
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class CardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {num}')
+            for num in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def get_with_render_count(self, url):
+        with mock.patch(
+                'posts.cards.render_to_string',
+                wraps=render_to_string) as render:
+            response = self.client.get(url)
+        return response, render.call_count
+
+    def test_cached_page_renders_no_cards(self):
+        """Повторный запрос страницы не рендерит карточки заново."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        first, rendered = self.get_with_render_count(url)
+        self.assertEqual(rendered, len(self.posts))
+        # Страница целиком пересобирается, карточки берутся из кеша.
+        page_cache.bump(scopes.author(self.user.username))
+        second, rendered = self.get_with_render_count(url)
+        self.assertEqual(rendered, 0)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(
+            cards.stats(),
+            {'hits': 3, 'misses': 3, 'hit_ratio': 0.5})
+
+    def test_post_edit_invalidates_card(self):
+        """Изменение поста сбрасывает только его карточку."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        post = self.posts[0]
+        post.title = 'Новый заголовок'
+        post.save()
+        response, rendered = self.get_with_render_count(url)
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, 'Новый заголовок')
+
+    def test_group_change_invalidates_cards(self):
+        """Переименование группы сбрасывает карточки её постов."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.client.get(url)
+        self.group.title = 'Новая группа'
+        self.group.save()
+        response, rendered = self.get_with_render_count(url)
+        self.assertEqual(rendered, len(self.posts))
+        self.assertContains(response, 'Новая группа')
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.settings import COMMENTS_PER_PAGE
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author, title='Пост', text='Текст')
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(5)
+        ]
+        Comment.objects.bulk_create([
+            Comment(
+                post=cls.post, author=readers[number % 5],
+                text=f'Комментарий {number}')
+            for number in range(COMMENTS_PER_PAGE * 2 + 5)
+        ])
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_detail_renders_first_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertContains(response, 'data-comments-more')
+
+    def test_fragment_pages_cover_all_comments(self):
+        """Курсор обходит все комментарии по порядку, без повторов."""
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        texts = []
+        cursor = None
+        while True:
+            # Страница и авторы её комментариев — одним запросом.
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    url, {'cursor': cursor} if cursor else {})
+            comments = response.context['comments']
+            texts += [comment.text for comment in comments]
+            cursor = comments.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(
+            texts,
+            [f'Комментарий {number}'
+             for number in range(COMMENTS_PER_PAGE * 2 + 5)])
+        self.assertNotContains(response, 'data-comments-more')
+        self.assertTemplateNotUsed(response, 'base.html')
@@ -0,0 +1,108 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, title='Пост', text='Текст', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+
+    def assertNotModified(self, url, client=None):
+        client = client or self.client
+        # Первый ответ может выставить cookie csrftoken.
+        client.get(url)
+        etag = client.get(url)['ETag']
+        # Ни view, ни шаблоны не вызываются: не больше одного запроса.
+        with self.assertNumQueries(1 if 'posts/' in url else 0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        return etag
+
+    def test_unchanged_pages_return_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotModified(url)
+
+    def test_authorized_user_gets_304_without_loading_session(self):
+        client = Client()
+        client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotModified(url, client)
+
+    def test_etag_differs_between_users(self):
+        """Пользовательские фрагменты страницы не отдаются чужим."""
+        client = Client()
+        client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    self.client.get(url)['ETag'], client.get(url)['ETag'])
+
+    def test_changes_invalidate_etag(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Post.objects.create(
+            author=self.author, title='Новый', text='Текст', group=self.group)
+        Comment.objects.create(post=self.post, author=self.author, text='Да')
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_lost_version_does_not_revive_etag(self):
+        """Вытесненная версия области не возвращает прежний ETag."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.author, title='Новый', text='Текст')
+        cache.delete('page-version:posts')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Новый')
+
+    def test_group_rename_changes_detail_etag(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.group.title = 'Другая'
+        self.group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Другая')
+
+    def test_author_rename_changes_detail_etag(self):
+        """Смена имени автора меняет ETag страницы поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Новое'
+        author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_missing_post_is_404(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk + 100]),
+            HTTP_IF_NONE_MATCH='"anything"')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_posts_count(self):
+        """Создание и удаление поста меняют posts_count автора."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        Post.objects.create(author=self.author, text='Текст')
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_follow_counts(self):
+        """Подписка и отписка меняют счётчики обеих сторон."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author]))
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author]))
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_comments_count_survives_post_edit(self):
+        """Счётчик комментариев не затирается сохранением поста."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        self.reader_client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий'})
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.text, 'Новый текст')
+
+    def test_reconcile_counters(self):
+        """reconcile_counters исправляет расхождения счётчиков."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        AuthorStats.objects.all().update(
+            posts_count=7, followers_count=7, following_count=7)
+        Post.objects.update(comments_count=7)
+
+        call_command('reconcile_counters', chunk_size=1, stdout=StringIO())
+
+        author_stats = self.stats(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+class BenchFeedTests(TestCase):
+    def test_hybrid_skips_fan_out_for_heavy_author(self):
+        """В гибридном режиме пост «тяжёлого» автора не пишется в ленты."""
+        out = StringIO()
+        call_command(
+            'bench_feed', followers=30, authors=3, posts=2, repeat=1,
+            threshold=10, stdout=out)
+        written = {
+            line.split()[0]: int(line.split()[-3])
+            for line in out.getvalue().splitlines()[1:]
+        }
+        self.assertEqual(written['push'], 31)
+        self.assertEqual(written['hybrid'], 0)
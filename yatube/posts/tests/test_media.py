@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from ..models import ImageBlob, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name):
+    return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+
+def files_in(directory):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), TEMP_MEDIA_ROOT)
+        for root, _, names in os.walk(os.path.join(TEMP_MEDIA_ROOT, directory))
+        for name in names
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TransactionTestCase):
+    """TransactionTestCase: файлы удаляются в on_commit."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user, text='Текст', image=uploaded(name))
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые картинки получают одно имя и один файл."""
+        first = self.create_post('one.gif')
+        second = self.create_post('two.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+        self.assertEqual(files_in('posts'), [first.image.name])
+        self.assertEqual(ImageBlob.objects.get().refs, 2)
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется только вместе с последним постом."""
+        first = self.create_post('one.gif')
+        second = self.create_post('two.gif')
+        name = first.image.name
+        first.delete()
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(ImageBlob.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DedupeMediaTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_dedupe_existing_files(self):
+        """dedupe_media сводит старые копии к одному файлу по хешу."""
+        user = User.objects.create_user(username='author')
+        names = [
+            default_storage.save(f'posts/{name}', ContentFile(SMALL_GIF))
+            for name in ('a.gif', 'b.gif')
+        ]
+        posts = [
+            Post.objects.create(author=user, text='Текст', image=name)
+            for name in names
+        ]
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('дубликатов удалено: 1', out.getvalue())
+        for post in posts:
+            post.refresh_from_db()
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        self.assertEqual(files_in('posts'), [posts[0].image.name])
+        self.assertEqual(
+            ImageBlob.objects.get(name=posts[0].image.name).refs, 2)
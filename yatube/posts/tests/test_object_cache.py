@@ -0,0 +1,93 @@
+from core import object_cache
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class ObjectCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, title='Пост', text='Текст', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def get(self, *args, **kwargs):
+        return object_cache.get_object(
+            self.factory.get('/'), *args, **kwargs)
+
+    def test_second_lookup_is_served_from_cache(self):
+        """Повторный поиск в другом запросе обходится без БД."""
+        self.get(Post.objects.select_related('author', 'group'),
+                 related=('author', 'group'), pk=self.post.pk)
+        with self.assertNumQueries(0):
+            post = self.get(
+                Post.objects.select_related('author', 'group'),
+                related=('author', 'group'), pk=self.post.pk)
+            self.assertEqual(post.author.username, 'author')
+            self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(object_cache.stats()['hits'], 3)
+
+    def test_user_secrets_are_not_cached(self):
+        """Хеш пароля и почта автора не попадают в общий кеш."""
+        User.objects.filter(pk=self.author.pk).update(
+            email='author@example.com')
+        self.get(User, username='author')
+        stored = cache.get(object_cache._object_key(User, self.author.pk))
+        self.assertEqual(stored.username, 'author')
+        self.assertEqual(
+            stored.get_deferred_fields() & {'password', 'email'},
+            {'password', 'email'})
+        user = self.get(User, username='author')
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'author@example.com')
+
+    def test_same_request_reuses_object(self):
+        request = self.factory.get('/')
+        first = object_cache.get_object(request, Group, slug='group')
+        with self.assertNumQueries(0):
+            second = object_cache.get_object(request, Group, slug='group')
+        self.assertIs(first, second)
+
+    def test_save_and_delete_invalidate(self):
+        self.get(Group, slug='group')
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(self.get(Group, slug='group').title, 'Новое название')
+        self.group.delete()
+        with self.assertRaises(Group.DoesNotExist):
+            self.get(Group, slug='group')
+
+    def test_rename_does_not_resolve_old_name(self):
+        """Старое имя пользователя не находит переименованного."""
+        self.get(User, username='author')
+        self.author.username = 'writer'
+        self.author.save()
+        with self.assertRaises(User.DoesNotExist):
+            self.get(User, username='author')
+        self.assertEqual(self.get(User, username='writer'), self.author)
+
+    def test_missing_object_is_404(self):
+        with self.assertRaises(Http404):
+            object_cache.get_object_or_404(
+                self.factory.get('/'), Post, pk=self.post.pk + 100)
+
+    def test_comment_does_not_leave_stale_post(self):
+        client = Client()
+        client.force_login(self.author)
+        self.get(Post, pk=self.post.pk)
+        client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'})
+        self.assertEqual(self.get(Post, pk=self.post.pk).comments_count, 1)
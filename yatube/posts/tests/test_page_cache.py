@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class SharedPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, title='Первый')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        ]
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос не выполняет ни одного SQL."""
+        for url in self.urls():
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+
+    def test_new_post_bumps_versions(self):
+        """Новый пост сразу виден на главной, в группе и в профиле."""
+        for url in self.urls():
+            self.guest_client.get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, title='Свежий')
+        for url in self.urls():
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий')
+
+    def test_moved_post_leaves_old_group_page(self):
+        """Перенос поста в другую группу обновляет старую ленту группы."""
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        self.assertContains(self.guest_client.get(url), 'Первый')
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertNotContains(self.guest_client.get(url), 'Первый')
+
+    def test_author_rename_bumps_group_and_old_profile(self):
+        """После переименования автора лента группы показывает новое имя."""
+        group_url = reverse('posts:group_posts', args=[self.group.slug])
+        old_profile_url = reverse('posts:profile', args=[self.author])
+        self.guest_client.get(group_url)
+        self.guest_client.get(old_profile_url)
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'renamed'
+        author.first_name = 'Новое'
+        author.save()
+        response = self.guest_client.get(group_url)
+        self.assertContains(response, 'Новое')
+        self.assertContains(
+            response, reverse('posts:profile', args=['renamed']))
+        self.assertEqual(
+            self.guest_client.get(old_profile_url).status_code, 404)
+
+    def test_page_parameter_is_part_of_key(self):
+        """?page= и ?cursor= дают разные записи кеша."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        response = self.guest_client.get(url, {'page': 2})
+        self.assertIsNotNone(response.context)
+
+    def test_authorized_users_share_cached_body(self):
+        """Авторизованные получают общий кеш со своими фрагментами."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        with self.assertNumQueries(2):
+            # Только сессия и пользователь для шапки.
+            response = self.authorized_client.get(url)
+        self.assertNotIn('page_obj', response.context)
+        self.assertContains(response, self.reader.username)
+        self.assertContains(response, reverse('posts:post_create'))
+        self.assertContains(response, reverse('posts:follow_index'))
+        self.assertNotContains(response, '<!--hole:')
+        guest_response = self.guest_client.get(url)
+        self.assertNotContains(guest_response, reverse('posts:post_create'))
+
+    def test_follow_button_is_per_user(self):
+        """Кнопка подписки в кешированном профиле своя у каждого."""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        unfollow = reverse('posts:profile_unfollow', args=[self.author])
+        follow = reverse('posts:profile_follow', args=[self.author])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.guest_client.get(url), follow)
+        response = self.authorized_client.get(url)
+        self.assertNotIn('page_obj', response.context)
+        self.assertContains(response, unfollow)
+        author_client = Client()
+        author_client.force_login(self.author)
+        response = author_client.get(url)
+        self.assertNotContains(response, follow)
+        self.assertNotContains(response, unfollow)
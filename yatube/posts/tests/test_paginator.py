@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from yatube.settings import POSTS_ON_INDEX
@@ -32,6 +35,8 @@ class PaginatorViewsTest(TestCase):
     def setUp(self):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        # bulk_create не шлёт сигналов, версии страниц не меняются.
+        cache.clear()
 
     def test_first_page_contains_ten_records(self):
         """Paginator выводит 10 записей на одной странице."""
@@ -65,3 +70,41 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(Post.objects.count() %
                                  len(response.context['page_obj']),
                                  (Post.objects.count() % POSTS_ON_INDEX))
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Переход по курсорам выдаёт все посты ровно по одному разу."""
+        url = reverse('posts:index')
+        response = self.authorized_client.get(url)
+        page_obj = response.context['page_obj']
+        seen = [post.pk for post in page_obj]
+        while page_obj.next_cursor:
+            response = self.authorized_client.get(
+                url, {'cursor': page_obj.next_cursor})
+            page_obj = response.context['page_obj']
+            seen.extend(post.pk for post in page_obj)
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'pk', flat=True))
+        self.assertEqual(seen, expected)
+
+        response = self.authorized_client.get(
+            url, {'cursor': page_obj.previous_cursor})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            expected[:POSTS_ON_INDEX])
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        first = self.authorized_client.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url, {'cursor': first.next_cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор открывает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'broken'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), POSTS_ON_INDEX)
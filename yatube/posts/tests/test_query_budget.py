@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import POSTS_ON_INDEX
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Бюджет запросов на страницу из POSTS_ON_INDEX постов для авторизованного
+# пользователя (2 запроса уходят на сессию и пользователя). Если изменение
+# увеличивает число запросов, бюджет нужно поднимать осознанно.
+QUERY_BUDGETS = {
+    'index': 3,
+    'group_posts': 4,
+    'profile': 5,
+    # Ещё один запрос — валидатор ETag (conditional_page).
+    'post_detail': 5,
+    'follow_index': 4,
+}
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов страницы не зависит от числа постов и комментариев."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for num in range(POSTS_ON_INDEX + 2):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {num}')
+        cls.post = Post.objects.filter(author=cls.author).first()
+        commenters = [
+            User.objects.create_user(username=f'commenter-{num}')
+            for num in range(5)
+        ]
+        for commenter in commenters:
+            Comment.objects.create(
+                post=cls.post, author=commenter, text='Комментарий')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def assertWithinBudget(self, name, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), QUERY_BUDGETS[name],
+            f'{url}: {len(queries)} запросов при бюджете '
+            f'{QUERY_BUDGETS[name]}:\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+
+    def test_index(self):
+        self.assertWithinBudget('index', reverse('posts:index'))
+
+    def test_group_posts(self):
+        self.assertWithinBudget(
+            'group_posts',
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}))
+
+    def test_profile(self):
+        self.assertWithinBudget(
+            'profile',
+            reverse('posts:profile', kwargs={'username': self.author}))
+
+    def test_post_detail(self):
+        self.assertWithinBudget(
+            'post_detail',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+
+    def test_follow_index(self):
+        self.assertWithinBudget('follow_index', reverse('posts:follow_index'))
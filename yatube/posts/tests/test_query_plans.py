@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Таблицы, в которых запросы не должны сканироваться целиком.
+CHECKED_TABLES = ('posts_',)
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql):
+    """Полные сканы таблиц и сортировки во временном B-tree."""
+    problems = []
+    for step in query_plan(sql):
+        if 'TEMP B-TREE' in step:
+            problems.append(step)
+        elif step.startswith('SCAN') and 'USING' not in step:
+            problems.append(step)
+    return problems
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN для запросов лент: без full scan и temp sort."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Follow.objects.create(user=cls.user, author=cls.star)
+        for num in range(15):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {num}')
+            Post.objects.create(author=cls.star, text=f'Звезда {num}')
+        cls.post = Post.objects.filter(author=cls.author).first()
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ок')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def assertPlansClean(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(
+                    table in sql for table in CHECKED_TABLES):
+                continue
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(plan_problems(sql), [])
+        return response
+
+    def assertFeedPlansClean(self, url):
+        response = self.assertPlansClean(url)
+        cursor = response.context['page_obj'].next_cursor
+        self.assertIsNotNone(cursor)
+        response = self.assertPlansClean(url, {'cursor': cursor})
+        self.assertPlansClean(
+            url, {'cursor': response.context['page_obj'].previous_cursor})
+
+    def test_index(self):
+        self.assertFeedPlansClean(reverse('posts:index'))
+
+    def test_group_posts(self):
+        self.assertFeedPlansClean(
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}))
+
+    def test_profile(self):
+        self.assertFeedPlansClean(
+            reverse('posts:profile', kwargs={'username': self.author}))
+
+    def test_post_detail(self):
+        self.assertPlansClean(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+
+    def test_follow_index(self):
+        self.assertFeedPlansClean(reverse('posts:follow_index'))
+
+    def test_follow_index_with_pulled_authors(self):
+        with mock.patch('posts.timeline.TIMELINE_FANOUT_THRESHOLD', 1):
+            self.assertFeedPlansClean(reverse('posts:follow_index'))
@@ -0,0 +1,132 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+def found(query):
+    return [post.pk for post in search.SearchPaginator(query, 100).get_page()]
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        post = Post.objects.create(
+            author=self.user, title='Рыжий кот', text='Спит на окне')
+        self.assertEqual(found('кот'), [post.pk])
+        self.assertEqual(found('ОКНЕ'), [post.pk])
+        post.text = 'Ловит мышей'
+        post.save()
+        self.assertEqual(found('окне'), [])
+        self.assertEqual(found('мышей'), [post.pk])
+        post.delete()
+        self.assertEqual(found('кот'), [])
+
+    def test_title_ranks_above_text(self):
+        in_text = Post.objects.create(
+            author=self.user, title='Заметка', text='Про кота и собаку')
+        in_title = Post.objects.create(
+            author=self.user, title='Собаку', text='Выгуляли утром')
+        self.assertEqual(found('собаку'), [in_title.pk, in_text.pk])
+
+    def test_all_words_must_match(self):
+        post = Post.objects.create(
+            author=self.user, title='Кот', text='Рыжий и пушистый')
+        Post.objects.create(author=self.user, title='Кот', text='Чёрный')
+        self.assertEqual(found('рыжий кот'), [post.pk])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Кавычки и операторы FTS5 из запроса не ломают поиск."""
+        post = Post.objects.create(
+            author=self.user, title='AND', text='NEAR("кот")')
+        self.assertEqual(found('"NEAR(кот'), [post.pk])
+        self.assertEqual(found('*()"'), [])
+
+    def test_rebuild_indexes_bulk_created_posts(self):
+        Post.objects.bulk_create(
+            [Post(author=self.user, title='Пакет', text='Без сигналов')])
+        self.assertEqual(found('пакет'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(found('пакет')), 1)
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(
+                author=user, title=f'Пост {number}', text='Общий текст')
+            for number in range(15)
+        ]
+        Post.objects.create(author=user, title='Другое', text='Не найти')
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('posts:post_search')
+
+    def test_results_are_paginated_by_cursor(self):
+        """Все результаты обходятся по курсору без повторов."""
+        response = self.client.get(self.url, {'q': 'общий'})
+        first = response.context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertContains(
+            response, 'q=%D0%BE%D0%B1%D1%89%D0%B8%D0%B9&cursor=')
+        response = self.client.get(
+            self.url, {'q': 'общий', 'cursor': first.next_cursor})
+        second = response.context['page_obj']
+        self.assertEqual(len(second), 5)
+        self.assertIsNone(second.next_cursor)
+        self.assertEqual(
+            {post.pk for post in list(first) + list(second)},
+            {post.pk for post in self.posts})
+
+    def test_empty_query(self):
+        response = self.client.get(self.url, {'q': '  '})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class AdminSearchTests(TestCase):
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        Post.objects.create(author=admin, title='Кот', text='Рыжий')
+        Post.objects.create(author=admin, title='Пёс', text='Чёрный')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'рыжий'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_admin_search_finds_every_match(self):
+        """Находятся все подходящие посты, а не только первый из индекса."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        matches = {
+            Post.objects.create(author=admin, title='Кот', text=text).pk
+            for text in ('Рыжий', 'Чёрный', 'Белый')
+        }
+        Post.objects.create(author=admin, title='Пёс', text='Рыжий')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кот'})
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            matches)
+        self.assertEqual(
+            set(search.filter_matching(Post.objects.all(), 'кот')
+                .values_list('pk', flat=True)),
+            matches)
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from unittest import mock
+
+from core import page_cache
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+
+def scopes(request):
+    return ['stampede']
+
+
+class StampedeTests(TestCase):
+    """Истёкшую страницу пересчитывает один запрос из многих."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.renders = 0
+        self.renders_lock = threading.Lock()
+
+        def view(request):
+            with self.renders_lock:
+                self.renders += 1
+            # Пересчёт заметно дольше чтения из кеша.
+            time.sleep(0.2)
+            return HttpResponse('свежая')
+
+        self.view = page_cache.cache_shared_page(scopes)(view)
+
+    def store(self, expires, delta=0.1):
+        cache.set(
+            self.key(), ('старая', 'text/html; charset=utf-8', expires, delta),
+            60)
+
+    def get(self):
+        return self.view(self.factory.get('/')).content.decode()
+
+    def key(self):
+        request = self.factory.get('/')
+        return page_cache.page_key(request, scopes(request))
+
+    def hold_lock(self, age=0):
+        """Замок, взятый «другим процессом» age секунд назад."""
+        path = page_cache._lock_path(self.key())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+        self.addCleanup(page_cache._release, self.key())
+        if age:
+            stamp = time.time() - age
+            os.utime(path, (stamp, stamp))
+        return path
+
+    def get_concurrently(self):
+        barrier = threading.Barrier(50)
+        contents = []
+
+        def worker():
+            barrier.wait()
+            contents.append(self.get())
+
+        threads = [threading.Thread(target=worker) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return contents
+
+    def test_expired_page_recomputed_once(self):
+        self.store(expires=time.time() - 1)
+        contents = self.get_concurrently()
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(contents.count('свежая'), 1)
+        self.assertEqual(contents.count('старая'), 49)
+        self.assertEqual(self.get(), 'свежая')
+        self.assertEqual(self.renders, 1)
+
+    def test_fresh_page_not_recomputed(self):
+        self.store(expires=time.time() + 60)
+        self.assertEqual(self.get(), 'старая')
+        self.assertEqual(self.renders, 0)
+
+    def test_page_recomputed_early_before_expiry(self):
+        self.store(expires=time.time() + 1, delta=0.5)
+        with mock.patch.object(page_cache.random, 'random', return_value=0.99):
+            self.assertEqual(self.get(), 'свежая')
+        self.assertEqual(self.renders, 1)
+
+    def test_missing_page_rendered_and_cached(self):
+        self.assertEqual(self.get(), 'свежая')
+        self.assertEqual(self.get(), 'свежая')
+        self.assertEqual(self.renders, 1)
+
+    def test_missing_page_rendered_once(self):
+        contents = self.get_concurrently()
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(contents, ['свежая'] * 50)
+        self.assertFalse(os.path.exists(page_cache._lock_path(self.key())))
+
+    def test_locked_page_served_stale(self):
+        self.store(expires=time.time() - 1)
+        self.hold_lock()
+        self.assertEqual(self.get(), 'старая')
+        self.assertEqual(self.renders, 0)
+
+    def test_abandoned_lock_taken_over(self):
+        self.store(expires=time.time() - 1)
+        path = self.hold_lock(age=page_cache.PAGE_CACHE_LOCK_TIMEOUT + 1)
+        self.assertEqual(self.get(), 'свежая')
+        self.assertEqual(self.renders, 1)
+        self.assertFalse(os.path.exists(path))
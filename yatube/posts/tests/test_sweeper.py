@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import sweeper
+from ..models import Comment, Follow, ImageBlob, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+# Файлы старше часа: чистка их уже не щадит.
+OLD = time.time() - 2 * 60 * 60
+
+
+def store(name, content=b'x' * 100, mtime=OLD):
+    path = os.path.join(TEMP_MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as stream:
+        stream.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+def stored(name):
+    return os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SweepOrphansTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.state_file = os.path.join(TEMP_MEDIA_ROOT, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def sweep(self, *args):
+        out = StringIO()
+        call_command(
+            'sweep_orphans', '--state-file', self.state_file, *args,
+            stdout=out)
+        return out.getvalue()
+
+    def test_walk_is_ordered_and_resumable(self):
+        """Обход идёт по порядку полных имён и продолжается после after."""
+        for name in ('posts/b.gif', 'posts/a/2.gif', 'posts/a/1.gif',
+                     'posts/a.gif', 'posts/c/3.gif'):
+            store(name)
+        names = [
+            item.name for item in sweeper.walk(TEMP_MEDIA_ROOT, 'posts')]
+        self.assertEqual(names, [
+            'posts/a.gif', 'posts/a/1.gif', 'posts/a/2.gif', 'posts/b.gif',
+            'posts/c/3.gif',
+        ])
+        resumed = [
+            item.name
+            for item in sweeper.walk(TEMP_MEDIA_ROOT, 'posts', 'posts/a/1.gif')
+        ]
+        self.assertEqual(resumed, names[2:])
+
+    def test_unreferenced_old_files_are_deleted(self):
+        """Удаляются только старые файлы, на которые нет ссылок."""
+        store('posts/aa/used.gif')
+        store('posts/aa/orphan.gif')
+        store('posts/bb/fresh.gif', mtime=time.time())
+        Post.objects.create(
+            author=self.user, text='Текст', image='posts/aa/used.gif')
+        ImageBlob.objects.create(name='posts/aa/orphan.gif', refs=0)
+        output = self.sweep()
+        self.assertTrue(stored('posts/aa/used.gif'))
+        self.assertTrue(stored('posts/bb/fresh.gif'))
+        self.assertFalse(stored('posts/aa/orphan.gif'))
+        self.assertFalse(
+            ImageBlob.objects.filter(name='posts/aa/orphan.gif').exists())
+        self.assertIn('файлов 1 (0 КБ)', output)
+
+    def test_referenced_blobs_are_kept(self):
+        """Файл со ссылками в ImageBlob не удаляется, даже без поста."""
+        store('posts/aa/saving.gif')
+        ImageBlob.objects.create(name='posts/aa/saving.gif', refs=1)
+        self.sweep()
+        self.assertTrue(stored('posts/aa/saving.gif'))
+        self.assertTrue(ImageBlob.objects.filter(
+            name='posts/aa/saving.gif', refs=1).exists())
+
+    def test_post_saved_during_sweep_keeps_file(self):
+        """Пост, сохранённый после проверки пачки, не теряет файл."""
+        store('posts/aa/reused.gif')
+        old_enough = sweeper._old_enough
+
+        def save_post_meanwhile(files, min_age):
+            if not Post.objects.exists():
+                Post.objects.create(
+                    author=self.user, text='Текст',
+                    image='posts/aa/reused.gif')
+            return old_enough(files, min_age)
+
+        with mock.patch.object(
+                sweeper, '_old_enough', side_effect=save_post_meanwhile):
+            self.sweep()
+        self.assertTrue(stored('posts/aa/reused.gif'))
+        self.assertTrue(ImageBlob.objects.filter(
+            name='posts/aa/reused.gif', refs=1).exists())
+
+    def test_unknown_thumbnails_are_deleted(self):
+        """Миниатюры, которых нет в kvstore, удаляются."""
+        store('cache/ab/cd/lost.jpg')
+        self.sweep()
+        self.assertFalse(stored('cache/ab/cd/lost.jpg'))
+
+    def test_dry_run_deletes_nothing(self):
+        """--dry-run только считает."""
+        store('posts/orphan.gif')
+        Comment.objects.create(author=self.user, text='Текст')
+        output = self.sweep('--dry-run')
+        self.assertTrue(stored('posts/orphan.gif'))
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertIn('Будет удалено: файлов 1', output)
+
+    def test_dangling_rows_are_deleted(self):
+        """Комментарии без поста и подписки без пользователя удаляются."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        reader = User.objects.create_user(username='reader')
+        kept_comment = Comment.objects.create(
+            post=post, author=reader, text='Текст')
+        Comment.objects.create(author=reader, text='Текст')
+        kept_follow = Follow.objects.create(user=reader, author=self.user)
+        Follow.objects.create(user=reader)
+        output = self.sweep('--chunk-size', '1')
+        self.assertQuerysetEqual(
+            Comment.objects.all(), [kept_comment], transform=lambda x: x)
+        self.assertQuerysetEqual(
+            Follow.objects.all(), [kept_follow], transform=lambda x: x)
+        self.assertIn('комментариев 1, подписок 1', output)
+        self.assertFalse(os.path.exists(self.state_file))
+
+    def test_interrupted_sweep_resumes(self):
+        """Сохранённая точка пропускает уже пройденное."""
+        store('posts/a.gif')
+        store('posts/b.gif')
+        with open(self.state_file, 'w') as stream:
+            json.dump({'images': {
+                'position': 'posts/a.gif', 'deleted': 1, 'freed': 100,
+            }}, stream)
+        output = self.sweep()
+        self.assertTrue(stored('posts/a.gif'))
+        self.assertFalse(stored('posts/b.gif'))
+        self.assertIn('файлов 2', output)
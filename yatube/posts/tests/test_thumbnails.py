@@ -0,0 +1,209 @@
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+
+from .. import cards, presets, thumbnails
+from ..models import Group, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def count_created(self, url):
+        """Сколько миниатюр создаёт Pillow при рендере страницы."""
+        with mock.patch.object(
+                ThumbnailBackend, '_create_thumbnail',
+                autospec=True,
+                side_effect=ThumbnailBackend._create_thumbnail) as create:
+            self.authorized_client.get(url)
+        return create.call_count
+
+    def test_generated_thumbnails_are_reused(self):
+        """После generate страница поста не вызывает Pillow."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=uploaded())
+        self.assertEqual(
+            thumbnails.generate(post.image.name),
+            len(presets.all_geometries()))
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.assertEqual(self.count_created(url), 0)
+
+    def test_preset_geometries(self):
+        """Пресет даёт размеры для 1x и 2x."""
+        self.assertEqual(presets.geometry('card'), '239x200')
+        self.assertEqual(presets.geometry('card', 2), '478x400')
+        self.assertEqual(presets.geometry('detail', 2), '700')
+
+    def test_post_detail_uses_preset_srcset(self):
+        """Страница поста отдаёт картинку пресета detail с srcset."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=uploaded('detail.gif'))
+        thumbnails.generate(post.image.name)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        small, large = (
+            thumbnails.thumbnail_file(post.image.name, geometry).url
+            for geometry in ('350', '700')
+        )
+        self.assertContains(response, f'src="{small}"')
+        self.assertContains(response, f'srcset="{small} 1x, {large} 2x"')
+
+    def test_feed_resolves_thumbnails_in_one_lookup(self):
+        """Миниатюры ленты находятся одним get_many, без поштучных get
+        и без обращений к хранилищу."""
+        posts = [
+            Post.objects.create(
+                author=self.user, text='Текст', image=uploaded(f'{num}.gif'))
+            for num in range(3)
+        ]
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        with mock.patch.object(
+                default.kvstore, 'get', wraps=default.kvstore.get) as get, \
+                mock.patch.object(
+                    FileSystemStorage, 'exists', autospec=True,
+                    side_effect=FileSystemStorage.exists) as exists:
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(get.call_count, 0)
+        self.assertEqual(exists.call_count, 0)
+        self.assertContains(response, 'loading="lazy"', count=len(posts))
+        for post in posts:
+            for density in presets.DENSITIES:
+                thumbnail = thumbnails.thumbnail_file(
+                    post.image.name, presets.geometry('card', density))
+                self.assertContains(response, f'{thumbnail.url} {density}x')
+
+    def test_missing_thumbnails_leave_work_to_background(self):
+        """Без готовых миниатюр лента показывает заглушку и не ждёт Pillow."""
+        post = Post.objects.create(
+            author=self.user, text='Текст',
+            image=SimpleUploadedFile(
+                'fresh.gif', SMALL_GIF + b'fresh', content_type='image/gif'),
+            image_placeholder='data:image/gif;base64,R0lGODlh',
+            image_color='#ff0000')
+        url = reverse('posts:profile', args=[self.user.username])
+        with mock.patch('posts.thumbnails.transaction.on_commit') as on_commit:
+            self.assertEqual(self.count_created(url), 0)
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'src="data:image/gif;base64,R0lGODlh"')
+        self.assertNotContains(response, 'srcset=')
+        # Карточка с заглушкой не кешируется.
+        self.assertIsNone(cache.get(cards.card_key('profile', post.pk)))
+        with mock.patch('posts.thumbnails._get_executor') as executor:
+            for call in on_commit.call_args_list:
+                call[0][0]()
+        executor.return_value.submit.assert_called_once_with(
+            thumbnails._generate_in_background, post.image.name)
+
+    def test_ready_thumbnails_replace_placeholder(self):
+        """Готовые миниатюры сменяют заглушку в ленте и ETag поста."""
+        post = Post.objects.create(
+            author=self.user, text='Текст',
+            image=SimpleUploadedFile(
+                'ready.gif', SMALL_GIF + b'ready', content_type='image/gif'),
+            image_placeholder='data:image/gif;base64,R0lGODlh',
+            image_color='#ff0000')
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', args=[post.pk])
+        with mock.patch('posts.thumbnails.transaction.on_commit'):
+            response = self.authorized_client.get(index)
+            self.assertNotContains(response, 'srcset=')
+            etag = self.authorized_client.get(detail)['ETag']
+        thumbnails.generate(post.image.name)
+        self.assertContains(self.authorized_client.get(index), 'srcset=')
+        response = self.authorized_client.get(
+            detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'srcset=')
+
+    def test_missing_source_renders_without_thumbnail(self):
+        """Пропавший файл картинки не роняет ленты и страницу поста."""
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        post = Post.objects.create(
+            author=self.user, text='Текст', group=group,
+            # Свои байты: миниатюр с таким именем ещё нет в хранилище.
+            image=SimpleUploadedFile(
+                'lost.gif', SMALL_GIF + b'lost', content_type='image/gif'))
+        default.storage.delete(post.image.name)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotContains(response, 'srcset=')
+
+    def test_post_create_enqueues_thumbnails(self):
+        """post_create ставит миниатюры в очередь после коммита."""
+        with mock.patch('posts.thumbnails.transaction.on_commit') as on_commit:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                {'title': 'Пост', 'text': 'Текст',
+                 'image': uploaded('new.gif')})
+        post = Post.objects.get()
+        # После коммита срабатывают и другие колбэки (кеш объектов).
+        with mock.patch('posts.thumbnails._get_executor') as executor:
+            for call in on_commit.call_args_list:
+                call[0][0]()
+        executor.return_value.submit.assert_called_once_with(
+            thumbnails._generate_in_background, post.image.name)
+
+    def test_backfill_command(self):
+        """generate_thumbnails готовит миниатюры уже загруженных картинок."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=uploaded('old.gif'))
+        Post.objects.create(author=self.user, text='Без картинки')
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        self.assertIn('Картинок обработано: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertTrue(post.image_placeholder.startswith('data:image/'))
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.assertEqual(self.count_created(url), 0)
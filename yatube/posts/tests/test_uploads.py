@@ -0,0 +1,135 @@
+import base64
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.urls import reverse
+from PIL import Image
+
+from .. import uploads
+from ..forms import PostForm
+from ..models import Post
+
+User = get_user_model()
+
+EXIF_ORIENTATION = 0x0112
+
+
+def image_file(name, size, mode='RGB', image_format='JPEG', exif=None,
+               icc_profile=None):
+    buffer = BytesIO()
+    image = Image.new(mode, size, 'red')
+    options = {'exif': exif} if exif is not None else {}
+    if icc_profile is not None:
+        options['icc_profile'] = icc_profile
+    image.save(buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def open_upload(upload):
+    upload.seek(0)
+    return Image.open(BytesIO(upload.read()))
+
+
+class UploadPipelineTests(TestCase):
+    def test_large_image_is_capped(self):
+        """Большая сторона уменьшается до POST_IMAGE_MAX_SIDE."""
+        with mock.patch('posts.uploads.POST_IMAGE_MAX_SIDE', 100):
+            result = uploads.normalize(image_file('big.jpg', (400, 200)))
+        self.assertEqual(open_upload(result).size, (100, 50))
+
+    def test_exif_orientation_applied_and_stripped(self):
+        """Поворот из EXIF применяется, сами EXIF не сохраняются."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        exif[0x010F] = 'Телефон'
+        result = uploads.normalize(
+            image_file('photo.jpg', (40, 20), exif=exif.tobytes()))
+        image = open_upload(result)
+        self.assertEqual(image.size, (20, 40))
+        self.assertEqual(len(image.getexif()), 0)
+
+    def test_formats(self):
+        """Картинки пересохраняются в JPEG, прозрачные — в PNG."""
+        cases = (
+            (image_file('a.png', (10, 10), image_format='PNG'), 'a.jpg'),
+            (image_file('b.png', (10, 10), 'RGBA', 'PNG'), 'b.png'),
+        )
+        for upload, name in cases:
+            with self.subTest(name=name):
+                self.assertEqual(uploads.normalize(upload).name, name)
+
+    def test_icc_profile_kept_only_for_rgb(self):
+        """RGB-профиль сохраняется, CMYK-профиль в RGB-файл не попадает."""
+        cases = (('RGB', b'rgb-profile'), ('CMYK', None))
+        for mode, expected in cases:
+            with self.subTest(mode=mode):
+                result = uploads.normalize(image_file(
+                    'photo.jpg', (10, 10), mode,
+                    icc_profile=mode.lower().encode() + b'-profile'))
+                image = open_upload(result)
+                self.assertEqual(image.mode, 'RGB')
+                self.assertEqual(image.info.get('icc_profile'), expected)
+
+    def test_post_form_normalizes_image(self):
+        """PostForm кладёт в cleaned_data уже обработанную картинку."""
+        form = PostForm(
+            {'title': 'Пост', 'text': 'Текст'},
+            {'image': image_file('photo.png', (10, 10), image_format='PNG')})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['image'].name, 'photo.jpg')
+        self.assertTrue(form.instance.image_placeholder.startswith(
+            'data:image/jpeg;base64,'))
+        # Мастер уже пересжат в JPEG: красный может стать #fe0000.
+        self.assertRegex(form.instance.image_color, r'^#f[0-9a-f]0000$')
+
+    def test_placeholder_is_tiny(self):
+        """Заглушка не больше PLACEHOLDER_SIDE и весит меньше килобайта."""
+        data_uri, color = uploads.placeholder(Image.new('RGB', (800, 400)))
+        self.assertLess(len(data_uri), 1024)
+        self.assertEqual(color, '#000000')
+        data = base64.b64decode(data_uri.split(',', 1)[1])
+        self.assertEqual(Image.open(BytesIO(data)).size, (20, 10))
+
+
+class UploadLimitsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def post_image(self, upload):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'title': 'Пост', 'text': 'Текст', 'image': upload})
+
+    def test_oversized_file_is_rejected(self):
+        """Файл больше лимита не дочитывается и даёт ошибку формы."""
+        upload = image_file('big.png', (300, 300), image_format='PNG')
+        with mock.patch('core.upload_handlers.FILE_UPLOAD_MAX_SIZE', 100), \
+                mock.patch('posts.forms.FILE_UPLOAD_MAX_SIZE', 100), \
+                mock.patch('posts.uploads.FILE_UPLOAD_MAX_SIZE', 100), \
+                mock.patch('posts.forms.uploads.normalize') as normalize:
+            response = self.post_image(upload)
+        form = response.context['form']
+        self.assertEqual(form.errors['image'], ['Файл больше 0 МБ.'])
+        self.assertEqual(form.files['image'].size, 101)
+        normalize.assert_not_called()
+        self.assertFalse(Post.objects.exists())
+
+    def test_too_many_pixels_rejected_before_decode(self):
+        """Картинка с лишними пикселями отклоняется по заголовку."""
+        upload = image_file('wide.jpg', (100, 100))
+        with mock.patch('posts.uploads.POST_IMAGE_MAX_PIXELS', 5000), \
+                mock.patch('posts.forms.uploads.normalize') as normalize:
+            response = self.post_image(upload)
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 0 мегапикселей.')
+        normalize.assert_not_called()
+        self.assertFalse(Post.objects.exists())
@@ -1,10 +1,17 @@
+from io import StringIO
+from unittest import mock
+
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from .. import timeline
+from ..models import Follow, Group, Post, TimelineEntry
 
 User = get_user_model()
 
@@ -233,3 +240,99 @@ class FollowsTests(TestCase):
         response = self.auth_client2.get(reverse('posts:follow_index'))
         new_count_posts = len(response.context['page_obj'])
         self.assertEqual(count_posts, new_count_posts)
+
+    def test_follow_feed_reads_materialized_timeline(self):
+        """Лента подписок собирается из TimelineEntry и чистится
+        при отписке."""
+        post = Post.objects.create(author=FollowsTests.user1, text='old')
+        self.auth_client2.get(reverse('posts:profile_follow',
+                                      args=[FollowsTests.user1]))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=FollowsTests.user2, post=post).exists())
+        response = self.auth_client2.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+        self.auth_client2.get(reverse('posts:profile_unfollow',
+                                      args=[FollowsTests.user1]))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=FollowsTests.user2).exists())
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты из Follow."""
+        Follow.objects.create(user=FollowsTests.user2,
+                              author=FollowsTests.user1)
+        posts = [
+            Post.objects.create(author=FollowsTests.user1, text=str(num))
+            for num in range(3)
+        ]
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=FollowsTests.user2).values_list('post', flat=True)),
+            {post.pk for post in posts})
+
+    def test_rebuild_replaces_one_timeline_at_a_time(self):
+        """rebuild не стирает все ленты разом: каждая удаляется и
+        заполняется заново отдельно."""
+        Follow.objects.create(user=FollowsTests.user2,
+                              author=FollowsTests.user1)
+        post = Post.objects.create(author=FollowsTests.user1, text='Да')
+        with CaptureQueriesContext(connection) as queries:
+            timeline.rebuild(batch_size=1)
+        deletes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('DELETE')
+        ]
+        self.assertEqual(len(deletes), User.objects.count())
+        for sql in deletes:
+            self.assertIn('"user_id" =', sql)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(FollowsTests.user2.pk, post.pk)])
+
+    def test_heavy_author_posts_are_pulled_on_read(self):
+        """Посты авторов с большим числом подписчиков не копируются
+        в ленты, а подмешиваются при чтении в порядке pub_date."""
+        light_author = User.objects.create_user(username='light')
+        with mock.patch('posts.timeline.TIMELINE_FANOUT_THRESHOLD', 2):
+            Follow.objects.create(user=FollowsTests.user2,
+                                  author=FollowsTests.user1)
+            Follow.objects.create(user=light_author,
+                                  author=FollowsTests.user1)
+            Follow.objects.create(user=FollowsTests.user2,
+                                  author=light_author)
+            posts = [
+                Post.objects.create(author=author, text=str(num))
+                for num, author in enumerate(
+                    [FollowsTests.user1, light_author] * 3)
+            ]
+            self.assertFalse(TimelineEntry.objects.filter(
+                author=FollowsTests.user1).exists())
+            response = self.auth_client2.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), list(reversed(posts)))
+
+    def test_author_below_threshold_keeps_posts_in_feed(self):
+        """Посты, написанные, пока автор был «тяжёлым», остаются в
+        лентах, когда подписчиков становится меньше порога."""
+        other = User.objects.create_user(username='other')
+        with mock.patch('posts.timeline.TIMELINE_FANOUT_THRESHOLD', 2):
+            Follow.objects.create(user=FollowsTests.user2,
+                                  author=FollowsTests.user1)
+            Follow.objects.create(user=other, author=FollowsTests.user1)
+            post = Post.objects.create(author=FollowsTests.user1, text='Да')
+            Follow.objects.filter(user=other).delete()
+            response = self.auth_client2.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_heavy_author_can_be_deleted(self):
+        """Удаление «тяжёлого» автора не копирует его посты в ленты."""
+        author = User.objects.create_user(username='heavy')
+        other = User.objects.create_user(username='other')
+        with mock.patch('posts.timeline.TIMELINE_FANOUT_THRESHOLD', 2):
+            Follow.objects.create(user=FollowsTests.user2, author=author)
+            Follow.objects.create(user=other, author=author)
+            Post.objects.create(author=author, text='Да')
+            author.delete()
+        self.assertFalse(TimelineEntry.objects.exists())
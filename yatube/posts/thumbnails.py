@@ -0,0 +1,243 @@
+"""Подготовка и поиск миниатюр Post.image.
+
+Шаблоны показывают картинки по именам пресетов (см. posts.presets).
+Если миниатюра уже есть в хранилище и в kvstore sorl, её поиск только
+читает адрес, поэтому после загрузки картинки все размеры готовятся в
+фоновом потоке и ни один рендер страницы не ждёт Pillow. Пока
+миниатюр нет, на месте картинки показывается заглушка, а недостающие
+размеры ставятся в ту же очередь.
+
+Для ленты миниатюры всей страницы находятся заранее одним get_many
+(см. attach). Когда миниатюры готовы, страницы с заглушкой получают
+новые версии, а у постов с этой картинкой меняется updated — от него
+зависит ETag страницы поста.
+"""
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from core import object_cache, page_cache
+from core.batches import pk_chunks
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+
+from yatube.settings import THUMBNAIL_WORKERS
+
+from . import presets, scopes, uploads
+from .models import Post
+
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+# Картинка пресета: src для 1x, srcset для всех плотностей и размер 1x.
+PresetImage = namedtuple('PresetImage', ['url', 'srcset', 'width', 'height'])
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+# Картинки, миниатюры которых уже стоят в очереди.
+_queued = set()
+_queued_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def generate(image_name):
+    """Готовит все миниатюры картинки, возвращает их число."""
+    geometries = presets.all_geometries()
+    missing = [
+        geometry for geometry in geometries
+        if default.kvstore.get(thumbnail_file(image_name, geometry)) is None
+    ]
+    for geometry in geometries:
+        get_thumbnail(image_name, geometry, **THUMBNAIL_OPTIONS)
+    if missing:
+        _thumbnails_ready(image_name)
+    return len(geometries)
+
+
+def _thumbnails_ready(image_name):
+    """Новые версии страниц, где вместо картинки была заглушка."""
+    posts = Post.objects.filter(image=image_name)
+    rows = list(posts.values_list('pk', 'author__username', 'group__slug'))
+    if not rows:
+        return
+    posts.update(updated=timezone.now())
+    object_cache.invalidate(Post, [pk for pk, _, _ in rows])
+    page_cache.bump(
+        scopes.POSTS,
+        *{scopes.author(username) for _, username, _ in rows},
+        *{scopes.group(slug) for _, _, slug in rows if slug},
+    )
+
+
+def _kv_cache():
+    try:
+        return caches[thumbnail_settings.THUMBNAIL_CACHE]
+    except InvalidCacheBackendError:
+        return cache
+
+
+def thumbnail_file(image_name, geometry):
+    """Миниатюра под тем же именем, что выберет ThumbnailBackend."""
+    backend = default.backend
+    source = ImageFile(image_name)
+    options = dict(THUMBNAIL_OPTIONS)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def resolve(pairs):
+    """{(имя картинки, размер): миниатюра} одним get_many к кешу kvstore.
+
+    Промахи (запись вытеснена из кеша) дочитываются из БД kvstore.
+    Миниатюр, которых нет и там, в ответе нет: их готовит фоновый
+    поток, а не запрос.
+    """
+    keys = {
+        pair: add_prefix(thumbnail_file(*pair).key) for pair in set(pairs)
+    }
+    if not keys:
+        return {}
+    values = _kv_cache().get_many(list(keys.values()))
+    resolved = {}
+    for (name, geometry), key in keys.items():
+        value = values.get(key)
+        if value is not None and value != EMPTY_VALUE:
+            resolved[name, geometry] = deserialize_image_file(value)
+            continue
+        stored = default.kvstore.get(thumbnail_file(name, geometry))
+        if stored is not None:
+            resolved[name, geometry] = stored
+        else:
+            _submit(name)
+    return resolved
+
+
+def _usable(image_file):
+    """Миниатюра, которую можно показать.
+
+    Для пропавшего исходника sorl отдаёт файл без размера. Хранилище
+    здесь не опрашивается: рендер не должен stat-ить каждую миниатюру,
+    а пропавшие исходники отсеивает фоновый поток.
+    """
+    return image_file.size is not None
+
+
+def preset_images(image_names, preset):
+    """{имя картинки: PresetImage} для всех плотностей пресета."""
+    geometries = {
+        density: presets.geometry(preset, density)
+        for density in presets.DENSITIES
+    }
+    resolved = resolve(
+        (name, geometry)
+        for name in image_names
+        for geometry in geometries.values()
+    )
+    images = {}
+    for name in image_names:
+        files = {
+            density: resolved[name, geometry]
+            for density, geometry in geometries.items()
+            if (name, geometry) in resolved
+            and _usable(resolved[name, geometry])
+        }
+        if 1 not in files:
+            continue
+        images[name] = PresetImage(
+            url=files[1].url,
+            srcset=', '.join(
+                f'{file.url} {density}x' for density, file in files.items()),
+            width=files[1].width,
+            height=files[1].height,
+        )
+    return images
+
+
+def attach(posts, preset):
+    """Проставляет post.thumbnail (PresetImage) всем постам страницы.
+
+    post.thumbnail_pending — у поста есть картинка, но её миниатюры
+    ещё не готовы (или исходник пропал).
+    """
+    posts = list(posts)
+    images = preset_images(
+        [post.image.name for post in posts if post.image], preset)
+    for post in posts:
+        post.thumbnail = images.get(post.image.name)
+        post.thumbnail_pending = bool(post.image) and post.thumbnail is None
+    return posts
+
+
+def backfill_one(image_name):
+    """Задача для пула процессов: миниатюры и заглушка одной картинки.
+
+    Возвращает (имя, ошибка или None, (заглушка, цвет) или None).
+    """
+    try:
+        generate(image_name)
+        with default.storage.open(image_name) as image_file:
+            placeholder = uploads.placeholder_for(image_file)
+    except Exception as error:
+        return image_name, f'{image_name}: {error}', None
+    return image_name, None, placeholder
+
+
+def image_names(chunk_size):
+    """Имена всех загруженных картинок постов, пачками по pk."""
+    for rows in pk_chunks(Post.objects.exclude(image=''), chunk_size, 'image'):
+        yield from (name for _, name in rows)
+
+
+def _generate_in_background(image_name):
+    try:
+        # Пропавший исходник не пересчитываем на каждом рендере ленты.
+        if default.storage.exists(image_name):
+            generate(image_name)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры %s', image_name)
+    finally:
+        with _queued_lock:
+            _queued.discard(image_name)
+        # Поток живёт дольше запроса: соединение с БД закрываем сами.
+        connection.close()
+
+
+def _submit(image_name):
+    """Ставит миниатюры картинки в очередь, если их там ещё нет."""
+    def submit():
+        with _queued_lock:
+            if image_name in _queued:
+                return
+            _queued.add(image_name)
+        _get_executor().submit(_generate_in_background, image_name)
+    transaction.on_commit(submit)
+
+
+def enqueue(post):
+    """Ставит в очередь миниатюры поста после фиксации транзакции."""
+    if post.image:
+        _submit(post.image.name)
@@ -0,0 +1,176 @@
+"""Ленты подписок: гибрид fan-out on write и fan-out on read.
+
+Пост обычного автора сразу дописывается в ленты всех его подписчиков,
+поэтому чтение /follow/ — это проход по индексу (user, -pub_date, -post).
+Посты авторов, у которых подписчиков (AuthorStats.followers_count) не
+меньше TIMELINE_FANOUT_THRESHOLD, в ленты не копируются: они подтягиваются
+при чтении и сливаются с материализованной лентой (k-way merge по pub_date).
+Когда автор опускается ниже порога, его последние посты копируются в
+ленты оставшихся подписчиков (см. refill).
+"""
+from core.batches import pk_chunks
+from core.paginator import CursorPaginator, MergedCursorPaginator
+from django.db import transaction
+
+from yatube.settings import (TIMELINE_BACKFILL, TIMELINE_FANOUT_THRESHOLD,
+                             TIMELINE_REBUILD_BATCH_SIZE)
+
+from .models import AuthorStats, Follow, Post, TimelineEntry, User
+
+
+def _heavy(threshold):
+    if threshold is None:
+        threshold = TIMELINE_FANOUT_THRESHOLD
+    return AuthorStats.objects.filter(followers_count__gte=threshold)
+
+
+def is_heavy(author_id, threshold=None):
+    return _heavy(threshold).filter(user_id=author_id).exists()
+
+
+def heavy_authors(user_id, threshold=None):
+    """id авторов из подписок читателя, чьи посты читаются при запросе."""
+    followed = Follow.objects.filter(user_id=user_id).values('author_id')
+    return list(
+        _heavy(threshold).filter(user_id__in=followed)
+        .values_list('user_id', flat=True)
+    )
+
+
+def _entries(user_ids, posts):
+    return [
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for user_id in user_ids
+        for post_id, author_id, pub_date in posts
+    ]
+
+
+def _bulk_insert(entries, batch_size=TIMELINE_REBUILD_BATCH_SIZE):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=batch_size, ignore_conflicts=True)
+
+
+def fan_out(post, batch_size=TIMELINE_REBUILD_BATCH_SIZE, threshold=None):
+    """Дописывает пост в ленты подписчиков, если автор не «тяжёлый».
+
+    Возвращает число записанных строк ленты.
+    """
+    if is_heavy(post.author_id, threshold):
+        return 0
+    followers = Follow.objects.filter(
+        author_id=post.author_id, user__isnull=False
+    ).values_list('user_id', flat=True).order_by('pk')
+    row = [(post.pk, post.author_id, post.pub_date)]
+    written = 0
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            _bulk_insert(_entries(batch, row), batch_size)
+            written += len(batch)
+            batch = []
+    if batch:
+        _bulk_insert(_entries(batch, row), batch_size)
+        written += len(batch)
+    return written
+
+
+def backfill(user_id, author_id, limit=TIMELINE_BACKFILL, threshold=None):
+    """Переносит последние посты автора в ленту нового подписчика."""
+    if not is_heavy(author_id, threshold):
+        _copy_posts(user_id, author_id, limit)
+
+
+def _copy_posts(user_id, author_id, limit=TIMELINE_BACKFILL):
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'author_id', 'pub_date')
+    _bulk_insert(_entries([user_id], posts[:limit]))
+
+
+def refill(author_id, threshold=None):
+    """Копирует посты автора, опустившегося ниже порога, в ленты.
+
+    Пока автор был «тяжёлым», его посты в ленты не копировались, а
+    теперь они перестанут подтягиваться при чтении: без этого они
+    пропали бы из лент оставшихся подписчиков. Возвращает число лент.
+    """
+    if is_heavy(author_id, threshold):
+        return 0
+    posts = list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list(
+            'id', 'author_id', 'pub_date')[:TIMELINE_BACKFILL])
+    if not posts:
+        return 0
+    followers = Follow.objects.filter(author_id=author_id, user__isnull=False)
+    refilled = 0
+    for batch in pk_chunks(
+            followers, TIMELINE_REBUILD_BATCH_SIZE, 'user_id'):
+        for _, user_id in batch:
+            _bulk_insert(_entries([user_id], posts))
+        refilled += len(batch)
+    return refilled
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося читателя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(batch_size=TIMELINE_REBUILD_BATCH_SIZE, user_ids=None,
+            threshold=None):
+    """Пересобирает ленты из Follow пачками по batch_size читателей.
+
+    Лента каждого читателя удаляется и заполняется заново в своей
+    короткой транзакции: остальные ленты тем временем читаются как
+    обычно. Нужна после изменения TIMELINE_FANOUT_THRESHOLD.
+    Возвращает число обработанных подписок.
+    """
+    readers = User.objects.all()
+    if user_ids is not None:
+        readers = readers.filter(pk__in=user_ids)
+    heavy = set(_heavy(threshold).values_list('user_id', flat=True))
+
+    processed = 0
+    for batch in pk_chunks(readers, batch_size):
+        follows = {}
+        for user_id, author_id in Follow.objects.filter(
+                user_id__in=batch, author__isnull=False
+        ).values_list('user_id', 'author_id').order_by('pk'):
+            follows.setdefault(user_id, []).append(author_id)
+        for user_id in batch:
+            authors = follows.get(user_id, [])
+            with transaction.atomic():
+                TimelineEntry.objects.filter(user_id=user_id).delete()
+                for author_id in authors:
+                    if author_id not in heavy:
+                        _copy_posts(user_id, author_id)
+            processed += len(authors)
+    return processed
+
+
+def feed_paginator(user, per_page, threshold=None):
+    """Пагинатор ленты подписок: материализованная часть + pull."""
+    heavy = heavy_authors(user.pk, threshold)
+    pushed = CursorPaginator(
+        user.timeline.exclude(author_id__in=heavy).select_related(
+            'post__author', 'post__group'),
+        per_page,
+        ordering=('-pub_date', '-post_id'),
+        transform=lambda entry: entry.post,
+    )
+    if not heavy:
+        return pushed
+    pulled = [
+        CursorPaginator(
+            Post.objects.filter(author_id=author_id).select_related(
+                'author', 'group'),
+            per_page,
+        )
+        for author_id in heavy
+    ]
+    return MergedCursorPaginator([pushed] + pulled, per_page)
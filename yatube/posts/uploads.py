@@ -0,0 +1,159 @@
+"""Обработка загруженной картинки поста до записи в хранилище.
+
+Телефонные фотографии приходят по 10-20 МБ, с поворотом в EXIF и
+метаданными. В хранилище кладётся уже повёрнутый мастер без EXIF,
+не больше POST_IMAGE_MAX_SIDE по большей стороне: он меньше занимает
+на диске, и миниатюры из него декодируются быстрее.
+
+До декодирования проверяются размер файла и число пикселей по
+заголовку: слишком большая картинка отклоняется ошибкой формы, не
+загружаясь в память.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageCms, ImageOps, features
+
+from yatube.settings import (FILE_UPLOAD_MAX_SIZE, POST_IMAGE_FORMAT,
+                             POST_IMAGE_MAX_PIXELS, POST_IMAGE_MAX_SIDE,
+                             POST_IMAGE_QUALITY)
+
+# Большая сторона заглушки: ~0.5 КБ, которые встраиваются прямо в HTML.
+PLACEHOLDER_SIDE = 20
+
+# Режимы, для которых ICC-профиль описывает RGB: после convert в RGB или
+# RGBA профиль остаётся верным.
+RGB_MODES = ('RGB', 'RGBA', 'RGBX', 'P')
+
+FORMATS = {
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'PNG': ('.png', 'image/png'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+
+
+def too_large_error():
+    return ValidationError(
+        f'Файл больше {FILE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.',
+        code='file_too_large')
+
+
+def probe(upload):
+    """(ширина, высота) по заголовку файла, без декодирования пикселей."""
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        raise ValidationError(
+            'Картинка слишком большая.', code='image_too_large')
+    finally:
+        upload.seek(0)
+
+
+def validate(upload):
+    """Отклоняет картинку по размеру файла и заголовку до декодирования."""
+    if upload.size > FILE_UPLOAD_MAX_SIZE:
+        raise too_large_error()
+    width, height = probe(upload)
+    if width * height > POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка больше {POST_IMAGE_MAX_PIXELS // 10 ** 6} '
+            f'мегапикселей.',
+            code='image_too_large')
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def _target_format(image):
+    image_format = POST_IMAGE_FORMAT
+    if image_format == 'WEBP' and not features.check('webp'):
+        image_format = 'JPEG'
+    # JPEG не умеет прозрачность: такие картинки остаются PNG.
+    if image_format == 'JPEG' and _has_alpha(image):
+        image_format = 'PNG'
+    return image_format
+
+
+def _convert(image, mode, icc_profile):
+    """(картинка в режиме mode, ICC-профиль для сохранения).
+
+    Профиль CMYK или оттенков серого к RGB-файлу не подходит: такая
+    картинка переводится через LittleCMS в sRGB и сохраняется без
+    профиля, а без LittleCMS просто теряет профиль.
+    """
+    if image.mode in RGB_MODES:
+        return image.convert(mode), icc_profile
+    if icc_profile and features.check('littlecms2'):
+        try:
+            return ImageCms.profileToProfile(
+                image, ImageCms.ImageCmsProfile(BytesIO(icc_profile)),
+                ImageCms.createProfile('sRGB'), outputMode=mode), None
+        except (ImageCms.PyCMSError, OSError):
+            pass
+    return image.convert(mode), None
+
+
+def normalize(upload):
+    """Новый файл с повёрнутой, уменьшенной и пересжатой картинкой.
+
+    Анимированные картинки возвращаются как есть: пересохранение
+    оставило бы от них первый кадр.
+    """
+    upload.seek(0)
+    with Image.open(upload) as original:
+        if getattr(original, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        icc_profile = original.info.get('icc_profile')
+        # JPEG сразу декодируется в уменьшенном масштабе (1/2 - 1/8).
+        original.draft(
+            'RGB', (POST_IMAGE_MAX_SIDE, POST_IMAGE_MAX_SIDE))
+        image = ImageOps.exif_transpose(original)
+    image.thumbnail(
+        (POST_IMAGE_MAX_SIDE, POST_IMAGE_MAX_SIDE), Image.LANCZOS)
+    image_format = _target_format(image)
+    image, icc_profile = _convert(
+        image,
+        'RGBA' if image_format != 'JPEG' and _has_alpha(image) else 'RGB',
+        icc_profile)
+
+    buffer = BytesIO()
+    # EXIF и прочие метаданные не передаются в save и не сохраняются;
+    # RGB-профиль оставляем, иначе поплывут цвета.
+    image.save(
+        buffer, image_format, quality=POST_IMAGE_QUALITY, optimize=True,
+        icc_profile=icc_profile)
+    extension, content_type = FORMATS[image_format]
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type)
+
+
+def placeholder(image):
+    """(data URI крошечной копии, основной цвет '#rrggbb') картинки."""
+    small = image.convert('RGB')
+    small.thumbnail((PLACEHOLDER_SIDE, PLACEHOLDER_SIDE), Image.BILINEAR)
+    buffer = BytesIO()
+    small.save(buffer, 'JPEG', quality=40)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    red, green, blue = small.resize((1, 1), Image.BOX).getpixel((0, 0))
+    return (
+        f'data:image/jpeg;base64,{data}',
+        f'#{red:02x}{green:02x}{blue:02x}',
+    )
+
+
+def placeholder_for(upload):
+    """Заглушка для файла, уже прошедшего normalize."""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image.draft('RGB', (PLACEHOLDER_SIDE * 4, PLACEHOLDER_SIDE * 4))
+        result = placeholder(image)
+    upload.seek(0)
+    return result
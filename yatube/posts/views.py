@@ -1,18 +1,22 @@
+from core.page_cache import (cache_shared_page, conditional_page,
+                             get_versions, scope_versions)
+from core import object_cache
+from core.paginator import CursorPaginator
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from django.db.models import OuterRef, Subquery
 from django.shortcuts import get_object_or_404, redirect, render
 
-from yatube.settings import POSTS_ON_INDEX
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_ON_INDEX
 
+from . import cards, counters, scopes, search, thumbnails, timeline
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Follow, Group, Post
 
 
-def pagination(request, queryset):
-    paginator = Paginator(queryset, POSTS_ON_INDEX)
+def pagination(request, paginator):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(page_number, request.GET.get('cursor'))
     return {
         'paginator': paginator,
         'page_namber': page_number,
@@ -21,66 +25,132 @@ def pagination(request, queryset):
 
 
 def get_page(request, post_list):
-    paginator = Paginator(post_list, POSTS_ON_INDEX)
+    paginator = CursorPaginator(post_list, POSTS_ON_INDEX)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(page_number, request.GET.get('cursor'))
     return page_obj
 
 
+@conditional_page(scope_versions(scopes.index_page))
+@cache_shared_page(scopes.index_page)
 def index(request):
     template = 'posts/index.html'
     posts = Post.objects.all()
+    page_obj = get_page(request, posts)
 
     context = {
-        'page_obj': get_page(request, posts),
+        'page_obj': page_obj,
+        'cards': cards.render_cards(page_obj, 'index'),
     }
 
     return render(request, template, context)
 
 
+@conditional_page(scope_versions(scopes.group_page))
+@cache_shared_page(scopes.group_page)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    group = object_cache.get_object_or_404(request, Group, slug=slug)
+    posts = group.posts.select_related('author')
+    page_obj = get_page(request, posts)
 
     context = {
         'group': group,
         'posts': posts,
-        'page_obj': get_page(request, posts),
+        'page_obj': page_obj,
+        'cards': cards.render_cards(page_obj, 'group'),
     }
 
     return render(request, template, context)
 
 
+@conditional_page(scope_versions(scopes.profile_page))
+@cache_shared_page(scopes.profile_page)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    number_of_posts = posts.count()
+    author = object_cache.get_object_or_404(
+        request, User.objects.select_related('stats'), username=username)
+    posts = author.posts.select_related('group')
+    stats = counters.stats_for(author)
+    number_of_posts = stats.posts_count
+    page_obj = get_page(request, posts)
     context = {
-        'page_obj': get_page(request, posts),
+        'page_obj': page_obj,
+        'cards': cards.render_cards(page_obj, 'profile'),
         'author': author,
         'posts': posts,
         'number_of_posts': number_of_posts,
+        'stats': stats,
     }
     return render(request, template, context)
 
 
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    paginator = search.SearchPaginator(query, POSTS_ON_INDEX)
+    context = pagination(request, paginator)
+    context.update({
+        'query': query,
+        'cards': cards.render_cards(context['page_obj'], 'group'),
+    })
+    return render(request, template, context)
+
+
+def post_detail_version(request, post_id):
+    """Всё, от чего зависит страница поста, одним запросом."""
+    last_comment = Comment.objects.filter(post=OuterRef('pk')).order_by(
+        '-created').values('created')[:1]
+    row = (
+        Post.objects.filter(pk=post_id)
+        .annotate(last_comment=Subquery(last_comment))
+        .values_list(
+            'updated', 'comments_count', 'last_comment', 'author__username',
+            'author__first_name', 'author__last_name')
+        .order_by()
+        .first()
+    )
+    if row is None:
+        return None
+    # Название группы меняется без правки поста: версия из кеша.
+    return row, get_versions([scopes.GROUPS])
+
+
+@conditional_page(post_detail_version)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comment = post.comments.all()
+    post = object_cache.get_object_or_404(
+        request, Post.objects.select_related('author', 'group'),
+        related=('author', 'group'), pk=post_id)
     form = CommentForm(request.POST or None)
     author = post.author
     context = {
         'post': post,
-        'comment': comment,
+        'comments': comments_page(request, post_id),
         'form': form,
         'author': author,
     }
     return render(request, template, context)
 
 
+def comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').order_by('created', 'id')
+    paginator = CursorPaginator(
+        comments, COMMENTS_PER_PAGE, ordering=('created', 'id'))
+    return paginator.get_page(cursor=request.GET.get('cursor'))
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев: фрагмент для подгрузки."""
+    template = 'posts/includes/comment_list.html'
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, template, context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -96,12 +166,17 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = author
     post.save()
+    thumbnails.enqueue(post)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    if request.method == 'POST':
+        # Сохраняется только свежая строка, а не копия из кеша.
+        post = get_object_or_404(Post, pk=post_id)
+    else:
+        post = object_cache.get_object_or_404(request, Post, pk=post_id)
     template1 = 'posts:post_detail'
     template2 = 'posts/create_post.html'
     if post.author != request.user:
@@ -113,7 +188,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.enqueue(post)
         return redirect(template1, post_id=post_id)
     context = {
         'post': post,
@@ -126,7 +203,7 @@ def post_edit(request, post_id):
 @login_required
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = object_cache.get_object_or_404(request, Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -140,8 +217,9 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user).all()
-    context = pagination(request, post_list)
+    paginator = timeline.feed_paginator(request.user, POSTS_ON_INDEX)
+    context = pagination(request, paginator)
+    thumbnails.attach(context['page_obj'], 'banner')
     template = 'posts/follow.html'
     return render(request, template, context)
 
@@ -149,7 +227,7 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     user = request.user
-    author = get_object_or_404(User, username=username)
+    author = object_cache.get_object_or_404(request, User, username=username)
     if user != author:
         Follow.objects.get_or_create(
             user=user,
@@ -1,4 +1,6 @@
 import os
+import sys
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -74,6 +76,40 @@ DATABASES = {
 }
 
 
+# Общий для всех процессов кеш и LRU в памяти каждого процесса перед
+# ним (core.two_tier_cache). Локально общий кеш — файлы в CACHE_DIR;
+# на сервере — memcached или redis: incr и add файлового кеша не атомарны.
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'core.two_tier_cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 1000,
+            # Сколько секунд процесс держит копию значения в памяти и
+            # как часто сверяется с журналом изменений других процессов.
+            'LOCAL_TIMEOUT': 5,
+            'SYNC_INTERVAL': 1,
+            # Счётчики попаданий меняются на каждом запросе.
+            'LOCAL_SKIP': ['object-cache:', 'post-card:'],
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+# Тесты не трогают файловый кеш разработчика и не видят записей прошлых
+# запусков: общий кеш у них в памяти процесса.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -137,6 +173,8 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 
 POSTS_ON_INDEX = 10
+# Комментариев на странице поста и в каждой следующей подгрузке.
+COMMENTS_PER_PAGE = 20
 
 
 MEDIA_URL = '/media/'
@@ -144,3 +182,88 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кто передаёт файлы из MEDIA_ROOT: None — сам Django (FileResponse),
+# 'X-Accel-Redirect' — nginx, 'X-Sendfile' — Apache/lighttpd.
+MEDIA_ACCEL = None
+# internal-location nginx, которая смотрит в MEDIA_ROOT.
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Сколько секунд браузер кеширует файлы с обычными именами: под тем же
+# именем может оказаться другой файл. Имена из хеша кешируются на год.
+MEDIA_MAX_AGE = 60 * 60
+
+
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL = 1000
+
+
+TIMELINE_REBUILD_BATCH_SIZE = 500
+
+
+# Авторы, у которых подписчиков не меньше порога, не рассылают посты
+# по лентам: их посты подтягиваются в ленту при чтении.
+TIMELINE_FANOUT_THRESHOLD = 1000
+
+
+COUNTERS_RECONCILE_CHUNK_SIZE = 1000
+
+
+# Сколько секунд хранится общая часть страницы в кеше.
+PAGE_CACHE_TIMEOUT = 60 * 5
+# Сколько секунд после срока отдаётся прежняя страница, пока один
+# запрос её пересчитывает, и через сколько брошенный пересчёт
+# уступает другому запросу.
+PAGE_CACHE_STALE_TIMEOUT = 60
+PAGE_CACHE_LOCK_TIMEOUT = 30
+# Сколько секунд запрос ждёт страницу, которой нет в кеше, пока её
+# считает другой запрос; замки пересчёта — файлы в PAGE_CACHE_LOCK_DIR.
+PAGE_CACHE_LOCK_WAIT = 3
+PAGE_CACHE_LOCK_DIR = os.path.join(CACHE_DIR, 'page-locks')
+if TESTING:
+    PAGE_CACHE_LOCK_DIR = os.path.join(
+        tempfile.gettempdir(), 'yatube-test-page-locks')
+# Насколько рано пересчитываются страницы (1 — обычно, больше — раньше).
+PAGE_CACHE_EARLY_BETA = 1.0
+# Сколько секунд хранятся посты, группы и пользователи (core.object_cache).
+OBJECT_CACHE_TIMEOUT = 60 * 60
+
+
+# Сколько потоков готовят миниатюры после загрузки.
+THUMBNAIL_WORKERS = 2
+
+
+# Загруженная картинка поста поворачивается по EXIF, очищается от
+# метаданных, уменьшается до POST_IMAGE_MAX_SIDE по большей стороне
+# и пересохраняется в POST_IMAGE_FORMAT ('JPEG' или 'WEBP').
+POST_IMAGE_MAX_SIDE = 2048
+POST_IMAGE_FORMAT = 'JPEG'
+POST_IMAGE_QUALITY = 85
+
+
+# Файлы больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся во временный файл,
+# а не держатся в памяти; дальше FILE_UPLOAD_MAX_SIZE файл не читается.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+FILE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'core.upload_handlers.MaxSizeUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+
+# Картинки больше стольких пикселей отклоняются по заголовку файла,
+# до декодирования (защита от «декомпрессионных бомб»).
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+
+# Чистка осиротевших файлов и строк (manage.py sweep_orphans).
+SWEEP_CHUNK_SIZE = 500
+# Файлы моложе стольких секунд не удаляются: пост может ещё сохраняться.
+SWEEP_MIN_AGE = 60 * 60
+# Где хранится точка, с которой продолжится прерванная чистка.
+SWEEP_STATE_FILE = os.path.join(BASE_DIR, '.sweep_state.json')
+
+
+# Админка: с фильтрами строки считаются не дальше этого числа, а
+# массовые действия меняют и удаляют посты пачками такого размера.
+ADMIN_COUNT_LIMIT = 10000
+ADMIN_BULK_CHUNK_SIZE = 500
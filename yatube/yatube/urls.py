@@ -1,5 +1,5 @@
+from core import media
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
@@ -9,6 +9,8 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', media.serve,
+         name='media'),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -16,11 +18,6 @@ handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
 
 
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
-
 #когда загрузишь на сайт, декомментируй это ок? 
 
 #if settings.DEBUG: